@@ -2,25 +2,44 @@ import dash
 from dash import dcc, dash_table
 from dash import html
 from dash.dependencies import Input, Output, State
-from smp_tickers import ALL_TICKERS
 import pandas as pd
-import talib
 import plotly.graph_objs as go
-from screener import get_screen_df, get_stock_info
+from screener import get_screen_scheduler, get_stock_info, merge_screen_records
 import dash_bootstrap_components as dbc
-from utils.data_fetching import fetch_stock_data_yahoo
+from utils.data_fetching import fetch_ticker_data_cached
 from utils.data_plottting import create_stock_chart
 import utils.layout
+from utils.ticker_search import TickerSearchIndex
+from utils.universe import universe_names, INDEX_LABELS, DEFAULT_INDICES
+from utils.earnings_store import get_earnings_refresher, EARNINGS_SOON_DAYS
+from utils.fundamentals_store import get_fundamentals_refresher
+from utils.metrics import instrument_callback, render, stage, CONTENT_TYPE
+from flask import Response
 import plotly.io as pio
 
 # Set default to dark chart
 pio.templates.default = 'dark_chart'
 
 df = pd.DataFrame()
+# Ticker autocomplete over every listed symbol; names missing from universe.csv
+# are filled in as screen rows and charts load them
+ticker_index = TickerSearchIndex(universe_names())
 # Initialize the app
 external_stylesheets = [dbc.themes.COSMO]
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
+
+# Prometheus scrape target: per-stage and per-callback latency, fetch
+# retries and errors, and the last scan's duration
+@app.server.route('/metrics')
+def metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+# Long ranges are downsampled to about this many points per pixel of chart width
+CHART_POINTS_PER_PIXEL = 1
+DEFAULT_WINDOW_WIDTH = 1920
+
 chart_container_style = {
     "padding": "20px",
     "height": "100vh",
@@ -35,8 +54,23 @@ app.layout = html.Div(
             children=[
                 html.Button('Refresh Table', id='refresh-button', className='btn btn-primary', n_clicks=0,
                             style={'border-radius': '10px', 'margin-left': '5px'}),
+                html.Button('Cancel', id='cancel-button', className='btn btn-secondary', n_clicks=0, disabled=True,
+                            style={'border-radius': '10px', 'margin-left': '5px'}),
+                html.Span(id='scan-progress', style={
+                          'margin-left': '10px', 'color': 'white', 'align-self': 'center'}),
+                html.Label("Universe:", style={
+                           'margin-right': '10px', 'color': 'white', 'font-size': '20px', 'margin-left': '100px',
+                           }),
+                dcc.Dropdown(
+                    id='universe-dropdown',
+                    options=[{'label': label, 'value': index} for index, label in INDEX_LABELS.items()],
+                    value=list(DEFAULT_INDICES),
+                    multi=True,
+                    clearable=False,
+                    style={'width': '400px', 'color': 'black'}
+                ),
                 html.Label("Period:", style={
-                           'margin-right': '10px', 'color': 'white', 'font-size': '20px',  'margin-left': '600px',
+                           'margin-right': '10px', 'color': 'white', 'font-size': '20px', 'margin-left': '100px',
                            }),
                 dcc.Dropdown(
                     id='time-range-dropdown',
@@ -72,55 +106,60 @@ app.layout = html.Div(
         ),
         html.Div([
             html.Div(
-                dcc.Loading(
-                    dash_table.DataTable(
-                        id='stock-table',
-                        columns=[
-                            {"name": 'Stock Ticker', "id": 'Stock Ticker'},
-                            {"name": 'Signal Name', "id": 'Signal Name'},
-                            {"name": '% Change', "id": '% Change'},
-                        ],
-                        data=df.to_dict('records'),
-                        row_selectable='single',
-                        sort_action="native",
-                        style_data_conditional=[
-                            {
-                                'if': {'filter_query': '{% Change} >= 0', 'column_id': '% Change'},
-                                'backgroundColor': 'green',
-                                'color': 'white'
-                            },
-                            {
-                                'if': {'filter_query': '{% Change} < 0', 'column_id': '% Change'},
-                                'backgroundColor': 'red',
-                                'color': 'white'
-                            },
-                            {
-                                'if': {'filter_query': '{Signal Name} contains "above"', 'column_id': 'Signal Name'},
-                                'color': 'green'
-                            },
-                            {
-                                'if': {'filter_query': '{Signal Name} contains "below"', 'column_id': 'Signal Name'},
-                                'color': 'red'
-                            }
-                        ],
-                        style_table={
-                            'overflowX': 'auto',
-                            'width': '100%',
-                            'height': '100%',
-                            'overflowY': 'auto',
-                            'margin': 'auto'
+                dash_table.DataTable(
+                    id='stock-table',
+                    columns=[
+                        {"name": 'Stock Ticker', "id": 'Stock Ticker'},
+                        {"name": 'Signal Name', "id": 'Signal Name'},
+                        {"name": 'Timeframe', "id": 'Timeframe'},
+                        {"name": '% Change', "id": '% Change'},
+                        {"name": 'Earnings In (days)', "id": 'Earnings In'},
+                    ],
+                    data=df.to_dict('records'),
+                    row_selectable='single',
+                    sort_action="native",
+                    style_data_conditional=[
+                        {
+                            'if': {'filter_query': '{% Change} >= 0', 'column_id': '% Change'},
+                            'backgroundColor': 'green',
+                            'color': 'white'
                         },
-                        style_header={
-                            'backgroundColor': 'rgb(50, 50, 50)',
-                            'fontWeight': 'bold'
+                        {
+                            'if': {'filter_query': '{% Change} < 0', 'column_id': '% Change'},
+                            'backgroundColor': 'red',
+                            'color': 'white'
                         },
-                        style_cell={
-                            'backgroundColor': 'rgb(50, 50, 50)',
+                        {
+                            'if': {'filter_query': f'{{Earnings In}} >= 0 && {{Earnings In}} <= {EARNINGS_SOON_DAYS}',
+                                   'column_id': 'Earnings In'},
+                            'backgroundColor': 'darkorange',
                             'color': 'white'
                         },
-                        fixed_rows={'headers': True}
-                    ),
-                    type='dot'
+                        {
+                            'if': {'filter_query': '{Signal Name} contains "above"', 'column_id': 'Signal Name'},
+                            'color': 'green'
+                        },
+                        {
+                            'if': {'filter_query': '{Signal Name} contains "below"', 'column_id': 'Signal Name'},
+                            'color': 'red'
+                        }
+                    ],
+                    style_table={
+                        'overflowX': 'auto',
+                        'width': '100%',
+                        'height': '100%',
+                        'overflowY': 'auto',
+                        'margin': 'auto'
+                    },
+                    style_header={
+                        'backgroundColor': 'rgb(50, 50, 50)',
+                        'fontWeight': 'bold'
+                    },
+                    style_cell={
+                        'backgroundColor': 'rgb(50, 50, 50)',
+                        'color': 'white'
+                    },
+                    fixed_rows={'headers': True}
                 ),
                 # Adjust margins as needed
                 style={'flex': '1', 'margin': '10px'}
@@ -159,15 +198,25 @@ app.layout = html.Div(
         ], style={'display': 'flex'}),
         # dbc.Table(id='info-table', bordered=True, class_name='table table-dark table-striped',
         #           hover=True, striped=True, size='sm', style={'margin-left': '30%', 'width': '60%'}),
+        # Polls for scan progress and new snapshots; scans run in the background scheduler
         dcc.Interval(
             id='interval-component',
-            interval=60*60*1000,  # in milliseconds
-        )
+            interval=2*1000,  # in milliseconds
+        ),
+        dcc.Store(id='snapshot-version', data='snapshot-0'),
+        dcc.Store(id='chart-width'),
     ],
     id="page-content",
 )
 
 
+app.clientside_callback(
+    "function(_) { return window.innerWidth; }",
+    Output('chart-width', 'data'),
+    Input('page-content', 'id'),
+)
+
+
 @app.callback(
     Output('stock-chart', 'figure'),
     [
@@ -178,9 +227,11 @@ app.layout = html.Div(
     [
         State('stock-table', 'data'),
         State('stock-ticker-input', 'value'),
+        State('chart-width', 'data'),
     ]
 )
-def display_chart(selected_rows, period, load_chart, data, selected_ticker):
+@instrument_callback
+def display_chart(selected_rows, period, load_chart, data, selected_ticker, window_width):
 
     ctx = dash.callback_context
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
@@ -205,20 +256,16 @@ def display_chart(selected_rows, period, load_chart, data, selected_ticker):
         'max': 20000
     }
 
-    old_period = period
-    if period in {'3mo', '6mo', 'ytd', '1y'}:
-        period = '2y'
-    elif period in {'2y', '5y'}:
-        period = 'max'
-
-    stock_data, info = fetch_stock_data_yahoo(selected_ticker, period, '1d')
-    stock_data['SMA_30'] = talib.SMA(stock_data['close'], timeperiod=30)
-    stock_data['SMA_50'] = talib.SMA(stock_data['close'], timeperiod=50)
-    stock_data['SMA_200'] = talib.SMA(stock_data['close'], timeperiod=200)
+    # Full history and SMAs are cached per ticker; periods are just slices of it
+    stock_data, info = fetch_ticker_data_cached(selected_ticker)
+    ticker_index.add(selected_ticker, info.get('longName'))
     # stock_data = stock_data.tail(250)
-    num_rows = period_num_rows.get(old_period, 200) // 1
+    num_rows = period_num_rows.get(period, 200) // 1
     stock_data = stock_data.tail(num_rows)
-    fig = create_stock_chart(stock_data, selected_ticker, info)
+    # The graph is 70vw wide; more points than pixels only adds payload
+    max_points = int((window_width or DEFAULT_WINDOW_WIDTH) * 0.7 * CHART_POINTS_PER_PIXEL)
+    with stage('chart'):
+        fig = create_stock_chart(stock_data, selected_ticker, info, max_points=max_points)
     fig.update_layout(
         autosize=True,
         title=f"<a href='https://finance.yahoo.com/quote/{selected_ticker}/'>{selected_ticker}</a>",
@@ -231,24 +278,77 @@ def display_chart(selected_rows, period, load_chart, data, selected_ticker):
     Output('stock-names', 'children'),
     [Input('stock-ticker-input', 'value')]
 )
+@instrument_callback
 def update_stock_name_suggestions(value):
     if value is None:
         return []
-    suggestions = [stock for stock in ALL_TICKERS if value.lower()
-                   in stock.lower()]
-    return [html.Option(value=suggestion) for suggestion in suggestions]
+    suggestions = ticker_index.search(value)
+    return [html.Option(name, value=symbol) for symbol, name in suggestions]
 
 
 @app.callback(
-    Output('stock-table', 'data'),
+    [
+        Output('stock-table', 'data'),
+        Output('snapshot-version', 'data'),
+        Output('scan-progress', 'children'),
+        Output('cancel-button', 'disabled'),
+    ],
     [
         Input('interval-component', 'n_intervals'),
-        Input('refresh-button', 'n_clicks')
+        Input('refresh-button', 'n_clicks'),
+        Input('cancel-button', 'n_clicks'),
+        Input('universe-dropdown', 'value'),
+    ],
+    [
+        State('snapshot-version', 'data'),
     ]
 )
-def update_data(intervals, n):
-    df = get_screen_df()
-    return df.to_dict('records')
+@instrument_callback
+def update_data(intervals, n, n_cancel, universe, shown):
+    # Each index is scanned and cached on its own; the table merges the
+    # selected ones
+    universe = universe or list(DEFAULT_INDICES)
+    get_earnings_refresher().start()
+    get_fundamentals_refresher().start()
+    schedulers = [get_screen_scheduler(index).start() for index in universe]
+    ctx = dash.callback_context
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    for scheduler in schedulers:
+        if button_id == 'refresh-button':
+            scheduler.refresh()
+        elif button_id == 'cancel-button':
+            scheduler.cancel()
+
+    keys = []
+    parts = []
+    done = total = 0
+    running = False
+    for index, scheduler in zip(universe, schedulers):
+        snapshot = scheduler.latest()
+        progress = scheduler.progress()
+        if progress.running:
+            running = True
+            done += progress.done
+            total += progress.total
+        # Stream a running scan's hits into the table, otherwise show the last snapshot
+        if progress.running and progress.show_partial:
+            keys.append(f"{index}-scan-{progress.scan_id}-{progress.done}")
+            parts.append(progress.records)
+        else:
+            keys.append(f"{index}-snapshot-{snapshot.version}")
+            parts.append(snapshot.df)
+    status = ''
+    if running:
+        status = f"Scanning {done} / {total}" if total else "Scanning..."
+
+    key = '|'.join(keys)
+    if key == shown:
+        return dash.no_update, dash.no_update, status, not running
+    parts = [part.to_dict('records') if isinstance(part, pd.DataFrame) else part for part in parts]
+    rows = merge_screen_records(parts, universe)
+    for row in rows:
+        ticker_index.add(row['Stock Ticker'], row.get('Stock Name'))
+    return rows, key, status, not running
 
 
 @app.callback(
@@ -262,6 +362,7 @@ def update_data(intervals, n):
         State('stock-ticker-input', 'value'),
     ]
 )
+@instrument_callback
 def update_info_table(selected_rows, n, data, selected_ticker):
 
     ctx = dash.callback_context
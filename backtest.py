@@ -0,0 +1,103 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.async_fetch import report_errors
+from utils.data_fetching import clean_stock_data, load_stock_history_batch
+from utils.history_store import get_history_store
+from utils.screen_engine import build_panel, SCREEN_RULES
+from utils.universe import universe_tickers
+
+# Backtest of the screen signals over the daily history in the local store.
+# Every rule is evaluated at every bar of every ticker at once as a bars x
+# tickers mask, then the forward returns after each signal are summarised.
+# Nothing is downloaded unless --fill is given, which first tops up the store
+# with the full daily history of every ticker tested.
+
+HORIZONS = (5, 20, 60)
+PERCENTILES = (5, 25, 50, 75, 95)
+BASELINE = 'All bars'
+
+
+def load_histories(tickers, start=None):
+    histories = get_history_store().read_many(tickers, '1d', start)
+    return {ticker: clean_stock_data(data) for ticker, data in histories.items() if not data.empty}
+
+
+def forward_returns(close, horizon):
+    # close[t + horizon] / close[t] - 1 per ticker; NaN past the last bar
+    returns = np.full(close.shape, np.nan)
+    if close.shape[0] > horizon:
+        returns[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    return returns
+
+
+def summarize(returns):
+    returns = returns[~np.isnan(returns)]
+    row = {'Count': len(returns)}
+    if len(returns) == 0:
+        return row
+    row['Mean'] = returns.mean()
+    row['Std'] = returns.std()
+    row['Win Rate'] = (returns > 0).mean()
+    for percentile, value in zip(PERCENTILES, np.percentile(returns, PERCENTILES)):
+        row[f'P{percentile}'] = value
+    return row
+
+
+def backtest(histories, tickers=None, rules=None, horizons=HORIZONS, signals=None):
+    # One row per (signal, horizon) with the distribution of forward returns
+    # from the close of the bar the signal fired on
+    rules = rules or SCREEN_RULES
+    tickers = [ticker for ticker in (tickers or histories) if ticker in histories]
+    if not tickers:
+        return pd.DataFrame()
+    panels = {column: build_panel(histories, tickers, column) for column in set(rules.columns) | {'close'}}
+    masks = rules.history_masks(rules.compute_series(panels))
+    if signals:
+        masks = {name: mask for name, mask in masks.items() if name in signals}
+    close = panels['close']
+    rows = []
+    for horizon in horizons:
+        returns = forward_returns(close, horizon)
+        rows.append({'Signal': BASELINE, 'Horizon': horizon, 'Tickers': len(tickers), **summarize(returns)})
+        for name, mask in masks.items():
+            fired = mask.any(axis=0).sum()
+            rows.append({'Signal': name, 'Horizon': horizon, 'Tickers': int(fired), **summarize(returns[mask])})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest screen signals on stored daily history')
+    parser.add_argument('--signals', nargs='*', help='rule names to test (default: all)')
+    parser.add_argument('--horizons', nargs='*', type=int, default=list(HORIZONS))
+    parser.add_argument('--tickers', nargs='*', help='tickers to test (default: the screened universe)')
+    parser.add_argument('--start', help='only use bars from this date')
+    parser.add_argument('--out', help='also write the results to this CSV file')
+    parser.add_argument('--fill', action='store_true',
+                        help="download the full daily history of missing or stale tickers first")
+    args = parser.parse_args()
+
+    tickers = args.tickers or universe_tickers()
+    if args.fill:
+        fill_time = time.time()
+        errors = {}
+        load_stock_history_batch(tickers, 'max', '1d', errors=errors)
+        report_errors(errors, 'history')
+        print(f"Filled the store for {len(tickers) - len(errors)}/{len(tickers)} tickers "
+              f"in {time.time() - fill_time:.2f} seconds")
+    start_time = time.time()
+    histories = load_histories(tickers, args.start)
+    loaded_time = time.time()
+    print(f"Loaded {len(histories)}/{len(tickers)} tickers from the store in {loaded_time - start_time:.2f} seconds")
+    results = backtest(histories, tickers, horizons=args.horizons, signals=args.signals)
+    print(f"Backtest took {time.time() - loaded_time:.2f} seconds")
+    with pd.option_context('display.max_rows', None, 'display.width', 200,
+                           'display.float_format', '{:.4f}'.format):
+        print(results)
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+
+if __name__ == '__main__':
+    main()
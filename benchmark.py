@@ -0,0 +1,300 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+
+# Offline: there is no server to protect, so the fetcher must not throttle,
+# and stored bars stay fresh for the whole run
+os.environ.setdefault('SMP_FETCH_RATE', '1000000')
+os.environ.setdefault('SMP_FETCH_BURST', '1000000')
+os.environ.setdefault('SMP_STORE_MAX_AGE', str(24 * 60 * 60))
+
+import numpy as np
+import pandas as pd
+import screener
+from utils.data_fetching import fetch_stock_history_batch, fetch_ticker_data_cached
+from utils.data_plottting import create_stock_chart, get_rangebreaks
+from utils.earnings_store import EarningsStore, set_earnings_store
+from utils.fundamentals_store import FundamentalsStore, set_fundamentals_store
+from utils.history_store import HistoryStore, set_history_store
+from utils.market_data import MarketDataProvider, period_start, set_provider
+from utils.replay_data import ReplayProvider
+from utils.sma_state import IncrementalScreener
+from utils.universe import universe_tickers
+
+# Benchmarks of the screen and chart hot paths against synthetic market data,
+# or recorded fixtures with --replay, so the numbers measure this code and not
+# Yahoo's latency. Results are saved as JSON; --compare prints the change
+# against an earlier run.
+
+RESULTS_PATH = 'benchmark_results.json'
+HISTORY_YEARS = 20
+HOURS_PER_SESSION = 7
+CHART_SAMPLE = 50
+CHART_WIDTH = 1920
+# tracemalloc slows calls down several times, so peak memory is taken from
+# this many calls per case
+MEMORY_SAMPLE = 50
+# A case is a regression when its p50 latency grows by more than this
+REGRESSION_THRESHOLD = 0.10
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_index(interval):
+    # Business days up to today; hourly bars cover the last two years only,
+    # like Yahoo's 730 day limit
+    days = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=HISTORY_YEARS * 252)
+    if interval != '1h':
+        return pd.DatetimeIndex(days, name='Date')
+    days = days[-504:]
+    hours = np.tile(np.arange(HOURS_PER_SESSION) + 9.5, len(days))
+    return pd.DatetimeIndex(days.repeat(HOURS_PER_SESSION) + pd.to_timedelta(hours, unit='h'), name='Date')
+
+
+class SyntheticProvider(MarketDataProvider):
+    # Every ticker is a seeded random walk, so runs are repeatable and each
+    # ticker gets the same bars whichever chunk or call asks for it.
+    host = 'synthetic'
+
+    def _history(self, ticker, interval, start=None):
+        index = synthetic_index(interval)
+        rng = np.random.default_rng(zlib.crc32(f'{ticker}/{interval}'.encode()))
+        close = np.round(100 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, len(index)))), 2)
+        spread = np.abs(rng.normal(0, 0.01, len(index)))
+        data = pd.DataFrame({
+            'Open': np.round(close * (1 + rng.normal(0, 0.005, len(index))), 2),
+            'High': np.round(close * (1 + spread), 2),
+            'Low': np.round(close * (1 - spread), 2),
+            'Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, len(index)).astype(float),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=index)
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tz is not None:
+                start = start.tz_convert('UTC').tz_localize(None)
+            data = data.loc[data.index >= start]
+        return data
+
+    def fetch_stock_data(self, ticker, period, interval, start=None):
+        return self._history(ticker, interval, start if start is not None else period_start(period))
+
+    def download_chunk(self, tickers, period, interval, start=None):
+        return {ticker: self.fetch_stock_data(ticker, period, interval, start) for ticker in tickers}
+
+    def get_stock_info(self, ticker):
+        close = self._history(ticker, '1d')['Close']
+        return {
+            'longName': f'{ticker} Synthetic Inc.',
+            'currency': 'USD',
+            'currentPrice': close.iloc[-1],
+            'previousClose': close.iloc[-2],
+            'open': close.iloc[-1],
+            'marketCap': 50_000_000_000,
+            'beta': 1.0,
+            'dividendRate': 1.0,
+            'dividendYield': 0.01,
+            'exDividendDate': 1700000000,
+            'targetMeanPrice': close.iloc[-1] * 1.1,
+        }
+
+    def get_stock_calendar(self, ticker):
+        return {'Earnings Date': [(pd.Timestamp.today() + pd.Timedelta(days=30)).date()]}
+
+
+@contextlib.contextmanager
+def offline_market(provider):
+    # Offline provider and throwaway history, earnings and fundamentals stores for the run
+    directory = tempfile.mkdtemp(prefix='smp-benchmark-')
+    set_provider(provider)
+    try:
+        yield directory
+    finally:
+        set_provider(None)
+        set_history_store(None)
+        set_earnings_store(None)
+        set_fundamentals_store(None)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def fresh_store(directory):
+    # Empty stores and no incremental state: the next scan starts cold
+    stamp = time.time_ns()
+    set_history_store(HistoryStore(os.path.join(directory, f'history-{stamp}.sqlite')))
+    set_earnings_store(EarningsStore(os.path.join(directory, f'earnings-{stamp}.sqlite')))
+    set_fundamentals_store(FundamentalsStore(os.path.join(directory, f'fundamentals-{stamp}.sqlite')))
+    for timeframe in screener.incremental_screeners:
+        screener.incremental_screeners[timeframe] = IncrementalScreener()
+
+
+def measure(calls, items_per_call, repeat=1, memory=True):
+    # calls: list of zero-argument callables, each timed separately. Timing
+    # runs without tracemalloc; an extra traced pass over the first
+    # MEMORY_SAMPLE calls gives peak memory.
+    latencies = []
+    peak = None
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        for _ in range(repeat):
+            for call in calls:
+                started = time.perf_counter()
+                call()
+                latencies.append(time.perf_counter() - started)
+        if memory:
+            tracemalloc.start()
+            try:
+                for call in calls[:MEMORY_SAMPLE]:
+                    call()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'total_seconds': total,
+        'tickers_per_second': items_per_call * len(latencies) / total if total else None,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'peak_memory_mb': peak / 1024 / 1024 if peak is not None else None,
+    }
+
+
+def bench_screen(directory, repeat, memory):
+    results = {}
+    universe = len(universe_tickers())
+
+    def cold():
+        fresh_store(directory)
+        screener.get_screen_df()
+    # Cold scans rebuild the store, so they are only run once; the store
+    # they leave behind is the warm one
+    results['get_screen_df[cold]'] = measure([cold], universe, 1, memory)
+    results['get_screen_df[warm]'] = measure([screener.get_screen_df], universe, repeat, memory)
+    results['get_screen_df[full]'] = measure(
+        [lambda: screener.get_screen_df(incremental=False)], universe, repeat, memory)
+    return results
+
+
+def bench_per_ticker(directory, repeat, memory):
+    # One ticker per call over a store that already holds 1y daily history:
+    # check_screen on frames loaded up front, fetch_stock_data reading its
+    # history from the store (and fundamentals for the hits) on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        tickers = universe_tickers()
+        histories = fetch_stock_history_batch(tickers, '1y', '1d')
+    frames = [histories[ticker] for ticker in tickers]
+    return {
+        'check_screen': measure(
+            [lambda data=data: screener.check_screen(data) for data in frames], 1, repeat, memory),
+        'fetch_stock_data': measure(
+            [lambda ticker=ticker: screener.fetch_stock_data(ticker) for ticker in tickers], 1, repeat, memory),
+    }
+
+
+def bench_charts(directory, repeat, memory, sample=CHART_SAMPLE):
+    tickers = universe_tickers()[:sample]
+    with contextlib.redirect_stdout(io.StringIO()):
+        charts = [(ticker, *fetch_ticker_data_cached(ticker)) for ticker in tickers]
+    max_points = int(CHART_WIDTH * 0.7)
+    results = {}
+    for label, rows in (('1y', 250), ('max', 20000)):
+        sliced = [(ticker, data.tail(rows), info) for ticker, data, info in charts]
+        results[f'create_stock_chart[{label}]'] = measure(
+            [lambda t=ticker, d=data, i=info: create_stock_chart(d, t, i, max_points=max_points)
+             for ticker, data, info in sliced], 1, repeat, memory)
+        results[f'get_rangebreaks[{label}]'] = measure(
+            [lambda d=data: get_rangebreaks(d.index) for _, data, _ in sliced], 1, repeat, memory)
+        results[f'get_rangebreaks[{label}, compact]'] = measure(
+            [lambda d=data: get_rangebreaks(d.index, compact=True) for _, data, _ in sliced], 1, repeat, memory)
+    return results
+
+
+CASES = {
+    'screen': bench_screen,
+    'per_ticker': bench_per_ticker,
+    'charts': bench_charts,
+}
+
+
+def run(cases, repeat, memory=True, provider=None):
+    results = {}
+    provider = provider or SyntheticProvider()
+    with offline_market(provider) as directory:
+        fresh_store(directory)
+        for name in cases:
+            started = time.time()
+            results.update(CASES[name](directory, repeat, memory))
+            print(f"{name} done in {time.time() - started:.1f} seconds")
+    return {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'provider': type(provider).__name__,
+        'tickers': len(universe_tickers()),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    # Returns the names of the cases whose p50 got slower than the threshold
+    regressions = []
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        memory = (f"{result['peak_memory_mb'] - before['peak_memory_mb']:+.1f}"
+                  if result['peak_memory_mb'] is not None and before['peak_memory_mb'] is not None else '')
+        flag = 'REGRESSION' if change > threshold else ''
+        if flag:
+            regressions.append(name)
+        rows.append({'Case': name, 'Before p50 ms': before['p50_ms'], 'After p50 ms': result['p50_ms'],
+                     'Change': f"{change:+.1%}", 'Memory MB': memory, '': flag})
+    print(pd.DataFrame(rows).to_string(index=False, float_format='{:.2f}'.format))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the screen and chart paths on synthetic data')
+    parser.add_argument('--cases', nargs='*', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--out', default=RESULTS_PATH, help='where to save the JSON results')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--replay', help='replay fixtures directory to use instead of synthetic data')
+    parser.add_argument('--latency', type=float, default=0, help='replay: seconds added per request')
+    parser.add_argument('--error-rate', type=float, default=0, help='replay: share of requests that fail')
+    args = parser.parse_args()
+
+    provider = None
+    if args.replay:
+        provider = ReplayProvider(args.replay, latency=args.latency, error_rate=args.error_rate, seed=0)
+    current = run(args.cases, args.repeat, not args.no_memory, provider)
+    table = pd.DataFrame(current['results']).T
+    print(table.to_string(float_format='{:.2f}'.format))
+    with open(args.out, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Saved results to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,112 +1,364 @@
-import yfinance as yf
-from smp_tickers import ALL_TICKERS
-from utils.data_fetching import fetch_stock_data_yahoo, fetch_stock_info_yahoo
-from nifty50_tickers import nifty50_tickers
-import talib
-import concurrent.futures
+from utils.data_fetching import fetch_stock_history_yahoo, fetch_stock_history_batch, fetch_stock_info_batch, get_next_earning_date
+from utils.screen_engine import screen_universe, SCREEN_RULES
+from utils.sma_state import IncrementalScreener, supports_incremental
+from utils.async_fetch import report_errors, set_rate_share
+from utils.result_cache import SingleFlightCache
+from utils.scheduler import ScreenScheduler
+from utils.timeframes import TIMEFRAMES, SCREEN_TIMEFRAMES, base_groups, to_timeframes
+from utils.universe import universe_tickers, DEFAULT_INDICES
+from utils.earnings_store import get_earnings_store
+from utils.fundamentals_store import get_fundamentals
+from utils.metrics import stage, SCANS_TOTAL, SCAN_DURATION, SCAN_LAST_SUCCESS, SCAN_RECORDS, SCAN_FETCH_ERRORS
+import argparse
+import json
+import os
 import time
+import threading
+import uuid
+import zlib
+import concurrent.futures
 import pandas as pd
 import datetime as dt
 from datetime import datetime
 
-def check_screen(stock_data):
+# Rolling indicator state kept between scans so refreshes only apply the
+# newest bars, one per timeframe. Empty when the rules use more than the
+# close, and every scan screens the full history instead.
+incremental_screeners = ({timeframe: IncrementalScreener() for timeframe in TIMEFRAMES}
+                         if supports_incremental(SCREEN_RULES) else {})
+
+# Screen results are shared by every session; a forced refresh still waits
+# SCREEN_MIN_REFRESH seconds after the last scan
+SCREEN_CACHE_TTL = int(os.environ.get('SMP_SCREEN_TTL', 60 * 60))
+SCREEN_MIN_REFRESH = int(os.environ.get('SMP_SCREEN_MIN_REFRESH', 60))
+screen_cache = SingleFlightCache(SCREEN_CACHE_TTL, SCREEN_MIN_REFRESH)
+
+# Streaming scans work through the universe in chunks on a few workers
+SCREEN_CHUNK_SIZE = int(os.environ.get('SMP_SCREEN_CHUNK_SIZE', 100))
+SCREEN_WORKERS = int(os.environ.get('SMP_SCREEN_WORKERS', 4))
+
+
+def check_screen_all(stock_data):
+    # Every screen rule that fired on the last bar
     try:
-        today = stock_data.iloc[-1]
-        yesterday = stock_data.iloc[-2]
-        # Check if the 30-day SMA cross up 50-day SMA since previous day
-        if today['SMA_30'] > today['SMA_50'] and yesterday['SMA_30'] < yesterday['SMA_50']:
-            return True, '30 cross 50 above'
-        # Check if the 30-day SMA cross down 50-day SMA since previous day
-        if today['SMA_30'] < today['SMA_50'] and yesterday['SMA_30'] > yesterday['SMA_50']:
-            return True, '30 cross 50 below'
-        # Check if the 30-day SMA cross down 200-day SMA since previous day
-        if today['SMA_30'] < today['SMA_200'] and yesterday['SMA_30'] > yesterday['SMA_200']:
-            return True, '30 cross 200 below'
-        # Check if the 30-day SMA cross up 200-day SMA since previous day
-        if today['SMA_30'] > today['SMA_200'] and yesterday['SMA_30'] < yesterday['SMA_200']:
-            return True, '30 cross 200 above'
-        # Check if the Close price cross down 200-day SMA since previous day
-        if today['close'] < today['SMA_200'] and yesterday['close'] > yesterday['SMA_200']:
-            return True, 'Last below 200'
-        # Check if the close cross up 200-day SMA since previous day
-        if today['close'] > today['SMA_200'] and yesterday['close'] < yesterday['SMA_200']:
-            return True, 'Last above 200'
+        with stage('screen'):
+            return SCREEN_RULES.evaluate_frame(stock_data)
     except Exception as e:
         print("Error in check_screen:", e)
+    return []
+
+
+def check_screen(stock_data):
+    # First rule that fired, for callers that want a single signal
+    signals = check_screen_all(stock_data)
+    if signals:
+        return True, signals[0]
     return False, ''
 
 
+def screen_stock_data(stock_data):
+    # History only; info is fetched later for the tickers that pass
+    if stock_data is None or stock_data.empty:
+        return []
+    return check_screen_all(stock_data)
+
+
+def build_screen_record(ticker, signal, stock_data, info, timeframe='1d'):
+    last_data = stock_data.iloc[-1]
+    data_dict = {
+        'Signal Time': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'Signal Name': signal,
+        'Timeframe': timeframe,
+        'Stock Ticker': ticker,
+        'Stock Name': info.get('longName', ''),
+        'Current Price': info.get('currentPrice', ''),
+        '% Change': ((last_data['close'] / info.get('previousClose') - 1) * 100).round(2),
+        # Days to the next report, from the stored calendar, so no request per row
+        'Earnings In': get_earnings_store().days_until(ticker),
+        # 'Sector': data.info.get('sector', ''),
+        # 'Industry': data.info.get('industry', ''),
+        # 'Market Cap': data.info.get('marketCap', ''),
+        # 'Previous Close': data.info.get('previousClose', ''),
+        # '50-day Average Volume': data.info.get('averageVolume', ''),
+        # 'EPS': data.info.get('trailingEps', ''),
+        # 'PE Ratio': data.info.get('trailingPE', ''),
+        # 'Forward PE Ratio': data.info.get('forwardPE', ''),
+        # 'PEG Ratio': data.info.get('pegRatio', ''),
+        # 'Price to Sales Ratio': data.info.get('priceToSalesTrailing12Months', ''),
+        # 'Price to Book Ratio': data.info.get('priceToBook', ''),
+        # 'Price to Cashflow Ratio': data.info.get('priceToCashflow', ''),
+        # 'Enterprise Value': data.info.get('enterpriseValue', ''),
+        # 'Enterprise to Revenue Ratio': data.info.get('enterpriseToRevenue', ''),
+        # 'Enterprise to EBITDA Ratio': data.info.get('enterpriseToEbitda', ''),
+        # 'Beta': data.info.get('beta', ''),
+        # '52-week High': data.info.get('fiftyTwoWeekHigh', ''),
+        # '52-week Low': data.info.get('fiftyTwoWeekLow', ''),
+        # 'Dividend Rate': data.info.get('dividendRate', ''),
+        # 'Dividend Yield': data.info.get('dividendYield', ''),
+        # 'Ex-Dividend Date': data.info.get('exDividendDate', ''),
+        # '1y Target Estimate': data.info.get('targetMeanPrice', ''),
+        # 'Screened': True
+    }
+    return data_dict
+
+
 def fetch_stock_data(ticker):
 
     try:
-        stock_data, info = fetch_stock_data_yahoo(ticker, '1y', '1d')
-        # stock_data = data.history(period='1y', interval='1d')
-        stock_data['SMA_30'] = talib.SMA(stock_data['close'], timeperiod=30)
-        stock_data['SMA_50'] = talib.SMA(stock_data['close'], timeperiod=50)
-        stock_data['SMA_200'] = talib.SMA(stock_data['close'], timeperiod=200)
-        if stock_data.empty:
-            return None
-        is_true, signal = check_screen(stock_data)
-        if is_true:
-            # print(data.info)
-            last_data = stock_data.iloc[-1]
-            data_dict = {
-                'Signal Time': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'Signal Name': signal,
-                'Stock Ticker': ticker,
-                'Stock Name': info.get('longName', ''),
-                'Current Price': info.get('currentPrice', ''),
-                '% Change': ((last_data['close'] / info.get('previousClose') - 1) * 100).round(2),
-                # 'Sector': data.info.get('sector', ''),
-                # 'Industry': data.info.get('industry', ''),
-                # 'Market Cap': data.info.get('marketCap', ''),
-                # 'Previous Close': data.info.get('previousClose', ''),
-                # '50-day Average Volume': data.info.get('averageVolume', ''),
-                # 'EPS': data.info.get('trailingEps', ''),
-                # 'PE Ratio': data.info.get('trailingPE', ''),
-                # 'Forward PE Ratio': data.info.get('forwardPE', ''),
-                # 'PEG Ratio': data.info.get('pegRatio', ''),
-                # 'Price to Sales Ratio': data.info.get('priceToSalesTrailing12Months', ''),
-                # 'Price to Book Ratio': data.info.get('priceToBook', ''),
-                # 'Price to Cashflow Ratio': data.info.get('priceToCashflow', ''),
-                # 'Enterprise Value': data.info.get('enterpriseValue', ''),
-                # 'Enterprise to Revenue Ratio': data.info.get('enterpriseToRevenue', ''),
-                # 'Enterprise to EBITDA Ratio': data.info.get('enterpriseToEbitda', ''),
-                # 'Beta': data.info.get('beta', ''),
-                # '52-week High': data.info.get('fiftyTwoWeekHigh', ''),
-                # '52-week Low': data.info.get('fiftyTwoWeekLow', ''),
-                # 'Dividend Rate': data.info.get('dividendRate', ''),
-                # 'Dividend Yield': data.info.get('dividendYield', ''),
-                # 'Ex-Dividend Date': data.info.get('exDividendDate', ''),
-                # '1y Target Estimate': data.info.get('targetMeanPrice', ''),
-                # 'Screened': True
-            }
-            return data_dict
+        stock_data = fetch_stock_history_yahoo(ticker, '1y', '1d')
+        signals = screen_stock_data(stock_data)
+        if signals:
+            # Live info as in screen_chunk; the stored snapshots are for the info table
+            info = fetch_stock_info_batch([ticker]).get(ticker, {})
+            return [build_screen_record(ticker, signal, stock_data, info) for signal in signals]
     except Exception as e:
+        print(f"Error screening {ticker}:", e)
         return None
     return None
 
 
-def get_screen_df():
-    start = time.time()
+class ScreenCancelled(Exception):
+    pass
+
+
+def screen_chunk(tickers, incremental=True, cancel_event=None, timeframes=None):
+    # Fetch, screen and build records for one chunk of tickers. Each base
+    # interval is loaded once and every timeframe built on it is resampled.
+    errors = {}
+    if cancel_event is not None and cancel_event.is_set():
+        return [], errors
+    hits = []
+    for interval, (period, members) in base_groups(timeframes or SCREEN_TIMEFRAMES).items():
+        histories = fetch_stock_history_batch(tickers, period, interval, errors=errors)
+        for timeframe in members:
+            with stage('resample'):
+                frames = to_timeframes(histories, timeframe)
+            with stage('screen'):
+                if incremental and timeframe in incremental_screeners:
+                    found = incremental_screeners[timeframe].screen(frames, tickers)
+                else:
+                    found = screen_universe(frames, tickers)
+            hits.extend((ticker, signal, timeframe, frames[ticker]) for ticker, signal in found)
+    infos = fetch_stock_info_batch(sorted({ticker for ticker, _, _, _ in hits}), errors=errors)
+    records = []
+    for ticker, signal, timeframe, stock_data in hits:
+        try:
+            records.append(build_screen_record(ticker, signal, stock_data, infos.get(ticker, {}), timeframe))
+        except Exception as e:
+            print(f"Error building screen record for {ticker}:", e)
+    return records, errors
+
+
+def iter_screen(tickers=None, incremental=True, cancel_event=None, timeframes=None):
+    # Yields (tickers done, total, new records, errors) as each chunk
+    # finishes, so hits show up without waiting for the slowest chunk
+    tickers = list(universe_tickers() if tickers is None else tickers)
+    chunks = [tickers[i:i + SCREEN_CHUNK_SIZE] for i in range(0, len(tickers), SCREEN_CHUNK_SIZE)]
+    executor = concurrent.futures.ThreadPoolExecutor(SCREEN_WORKERS)
+    try:
+        futures = {executor.submit(screen_chunk, chunk, incremental, cancel_event, timeframes): chunk
+                   for chunk in chunks}
+        done = 0
+        for future in concurrent.futures.as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ScreenCancelled(f"Screen cancelled after {done} of {len(tickers)} tickers")
+            records, errors = future.result()
+            done += len(futures[future])
+            yield done, len(tickers), records, errors
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def sort_screen_records(records, tickers):
+    # Universe, timeframe then rule order
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    timeframe_order = {timeframe: i for i, timeframe in enumerate(TIMEFRAMES)}
+    rule_order = {name: i for i, name in enumerate(SCREEN_RULES.names)}
+    return sorted(records, key=lambda record: (order.get(record['Stock Ticker'], len(order)),
+                                               timeframe_order.get(record['Timeframe'], len(timeframe_order)),
+                                               rule_order.get(record['Signal Name'], len(rule_order))))
+
+
+def merge_screen_records(parts, universe=DEFAULT_INDICES):
+    # One view over several indices from their separate scans; a ticker
+    # listed in more than one of them is only shown once
+    seen = set()
+    records = []
+    for part in parts:
+        for record in part:
+            key = (record['Stock Ticker'], record['Timeframe'], record['Signal Name'])
+            if key not in seen:
+                seen.add(key)
+                records.append(record)
+    return sort_screen_records(records, universe_tickers(universe))
+
+
+def get_screen_df(incremental=True, on_progress=None, cancel_event=None, universe=DEFAULT_INDICES, shard=None):
+    # Scans the tickers of `universe`, an index name or a list of them, or
+    # with shard=(index, count) only that shard of them
+    start = time.perf_counter()
+    tickers = universe_tickers(universe)
+    if shard is not None:
+        tickers = shard_tickers(tickers, *shard)
     screened = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        results = executor.map(fetch_stock_data, ALL_TICKERS)
-        for result in results:
-            if result:
-                screened.append(result)
+    errors = {}
+    try:
+        for done, total, records, chunk_errors in iter_screen(tickers, incremental, cancel_event):
+            for result in records:
                 print(f"Stock {result} passed the screen.")
+            screened.extend(records)
+            errors.update(chunk_errors)
+            if on_progress is not None:
+                on_progress(done, total, list(screened))
+    except ScreenCancelled:
+        SCANS_TOTAL.inc(outcome='cancelled')
+        raise
+    except Exception:
+        SCANS_TOTAL.inc(outcome='failed')
+        raise
+    report_errors(errors, 'data')
+    # Chunks finish in any order
+    screened = sort_screen_records(screened, tickers)
     # print(screened)
     print(f"Total stocks passed the screen: {len(screened)}")
-    end = time.time()
-    print(f"Time taken to process  {end-start:.2f} seconds.")
+    print(f"Tickers with fetch errors: {len(errors)}")
+    SCANS_TOTAL.inc(outcome='completed')
+    SCAN_DURATION.set(time.perf_counter() - start)
+    SCAN_LAST_SUCCESS.set(time.time())
+    SCAN_RECORDS.set(len(screened))
+    SCAN_FETCH_ERRORS.set(len(errors))
     df = pd.DataFrame(screened)
-    
+    df.attrs['errors'] = sorted(errors)
     return df
 
+def get_cached_screen_df(force=False, on_progress=None, cancel_event=None, universe=DEFAULT_INDICES):
+    # Results are cached per index; several indices are merged from their
+    # cached results rather than scanned together
+    if not isinstance(universe, str):
+        parts = [get_cached_screen_df(force, on_progress, cancel_event, index).to_dict('records')
+                 for index in universe]
+        return pd.DataFrame(merge_screen_records(parts, universe))
+    return screen_cache.get(('screen', universe),
+                            lambda: get_screen_df(on_progress=on_progress, cancel_event=cancel_event,
+                                                  universe=universe),
+                            force=force)
+
+# Background scans, one scheduler per index, started the first time the app
+# shows that index; the app only reads their latest() and progress()
+SCREEN_INTERVAL = int(os.environ.get('SMP_SCREEN_INTERVAL', 60 * 60))
+screen_schedulers = {}
+_screen_schedulers_lock = threading.Lock()
+
+
+def get_screen_scheduler(index):
+    with _screen_schedulers_lock:
+        if index not in screen_schedulers:
+            screen_schedulers[index] = ScreenScheduler(
+                lambda on_progress, cancel_event: get_cached_screen_df(force=True, on_progress=on_progress,
+                                                                       cancel_event=cancel_event, universe=index),
+                SCREEN_INTERVAL, name=f'screen-scheduler-{index}')
+        return screen_schedulers[index]
+
+# Sharded scans split the universe by a hash of the ticker, so every process
+# or host given the same shard count agrees on who scans what. Each shard
+# writes its result to SHARD_DIR, which may be a directory shared between
+# hosts, and merge_shards builds the same DataFrame get_screen_df returns.
+SHARD_DIR = os.environ.get('SMP_SHARD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'data', 'shards'))
+
+
+def shard_of(ticker, shards):
+    return zlib.crc32(ticker.encode()) % shards
+
+
+def shard_tickers(tickers, shard, shards):
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is out of range for {shards} shards")
+    return [ticker for ticker in tickers if shard_of(ticker, shards) == shard]
+
+
+def shard_path(shard, shards, directory=SHARD_DIR):
+    return os.path.join(directory, f'shard-{shard:04d}-of-{shards:04d}.json')
+
+
+def shard_universe(universe):
+    # The universe as written to and compared between shard files
+    return sorted([universe] if isinstance(universe, str) else universe)
+
+
+def screen_shard(shard, shards, run_id, universe=DEFAULT_INDICES, incremental=True, directory=SHARD_DIR):
+    # Scans one shard and writes its records; returns the file's path.
+    # Every shard of one run is given the same run_id.
+    df = get_screen_df(incremental=incremental, universe=universe, shard=(shard, shards))
+    result = {
+        'run_id': run_id,
+        'shard': shard,
+        'shards': shards,
+        'universe': shard_universe(universe),
+        'created': time.time(),
+        'errors': df.attrs.get('errors', []),
+        'records': df.to_dict('records'),
+    }
+    path = shard_path(shard, shards, directory)
+    os.makedirs(directory, exist_ok=True)
+    # Written under a temporary name so a merge never reads half a file
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'w') as f:
+        json.dump(result, f, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+    os.replace(partial, path)
+    return path
+
+
+def merge_shards(shards, run_id, universe=DEFAULT_INDICES, directory=SHARD_DIR):
+    # Raises FileNotFoundError if any shard has not been written yet, and
+    # ValueError unless every file is from run `run_id` over `universe` in
+    # `shards` shards.
+    if not run_id:
+        raise ValueError("Merging shards needs the run id they were written with")
+    results, missing = [], []
+    for shard in range(shards):
+        try:
+            with open(shard_path(shard, shards, directory)) as f:
+                results.append(json.load(f))
+        except FileNotFoundError:
+            missing.append(shard)
+    if missing:
+        raise FileNotFoundError(f"Shards {missing} of {shards} have not been written to {directory}")
+    expected = {'run_id': run_id, 'shards': shards, 'universe': shard_universe(universe)}
+    mismatched = []
+    for shard, result in enumerate(results):
+        differences = [f'{key} {result.get(key)!r}' for key, value in expected.items() if result.get(key) != value]
+        if result.get('shard') != shard:
+            differences.append(f"shard {result.get('shard')!r}")
+        if differences:
+            created = datetime.fromtimestamp(result['created']).strftime('%Y-%m-%d %H:%M')
+            mismatched.append(f"shard {shard} has {', '.join(differences)} (written {created})")
+    if mismatched:
+        raise ValueError(f"Shard files do not match run {run_id!r} of {expected['universe']} "
+                         f"in {shards} shards: {'; '.join(mismatched)}")
+    return pd.DataFrame(merge_screen_records([result['records'] for result in results], universe))
+
+
+def get_sharded_screen_df(shards, workers=None, universe=DEFAULT_INDICES, incremental=True, directory=SHARD_DIR,
+                          run_id=None):
+    # Every shard in its own process, so the indicator work is not limited
+    # to one core by the GIL. The workers split this machine's fetch rate.
+    workers = workers or min(shards, os.cpu_count() or 1)
+    run_id = run_id or uuid.uuid4().hex
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=set_rate_share,
+                                                initargs=(1 / workers,)) as executor:
+        futures = [executor.submit(screen_shard, shard, shards, run_id, universe, incremental, directory)
+                   for shard in range(shards)]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+    return merge_shards(shards, run_id, universe, directory)
+
+
 def get_stock_info(ticker):
-    data = yf.Ticker(ticker)
-    stock_info = fetch_stock_info_yahoo(ticker)
+    # Rendered from the stored snapshot, however old, with the time it was
+    # fetched; only a ticker with no snapshot yet is fetched here
+    stock_info, updated_at = get_fundamentals(ticker)
+    stock_info = dict(stock_info, next_earning_date=get_next_earning_date(ticker))
     # data_dict = {
     #     'Stock Ticker': ticker,
     #     'Stock Name': data.info.get('longName', ''),
@@ -147,6 +399,7 @@ def get_stock_info(ticker):
         'Forward dividend & yield': f"{stock_info.get('dividendRate')} ({round(stock_info.get('dividendYield', 0) * 100, 2)} %)",
         'Ex-dividend date': convert_epoch_to_date_string(stock_info.get('exDividendDate', '')),
         '1y target est': stock_info.get('targetMeanPrice'),
+        'Data as of': datetime.fromtimestamp(updated_at).strftime('%b %d, %Y %H:%M'),
     }
 
     return data_dict
@@ -170,5 +423,49 @@ def convert_to_billions_or_trillions(amount):
     else:
         return f"{amount}"
 
+def main():
+    parser = argparse.ArgumentParser(description='Run the screen, optionally split into shards')
+    parser.add_argument('--universe', nargs='*', default=list(DEFAULT_INDICES), help='indices to scan')
+    parser.add_argument('--shards', type=int, help='split the universe into this many shards')
+    parser.add_argument('--shard', type=int,
+                        help='only scan this shard and write it to the shard directory (for running on several hosts)')
+    parser.add_argument('--workers', type=int, help='processes for scanning every shard here (default: one per core)')
+    parser.add_argument('--merge', action='store_true', help='only merge shard files that were already written')
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    parser.add_argument('--run-id', help='names the sharded run; every --shard of one run and its --merge need '
+                                         'the same one, and --merge only accepts files from that run')
+    parser.add_argument('--full', action='store_true', help='recompute indicators instead of updating them')
+    parser.add_argument('--out', help='also write the screen to this CSV file')
+    args = parser.parse_args()
+    if args.shards is None:
+        for option, value in (('--shard', args.shard), ('--merge', args.merge), ('--workers', args.workers),
+                              ('--run-id', args.run_id)):
+            if value not in (None, False):
+                parser.error(f"{option} needs --shards")
+    elif args.shards < 1:
+        parser.error("--shards must be at least 1")
+    elif args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be from 0 to {args.shards - 1} for {args.shards} shards")
+    elif args.shard is not None and args.merge:
+        parser.error("--shard writes one shard and --merge reads them all; give one or the other")
+    elif (args.shard is not None or args.merge) and not args.run_id:
+        parser.error("--shard and --merge need --run-id, so a merge only takes shards from one run")
+
+    incremental = not args.full
+    if args.shards is None:
+        df = get_screen_df(incremental=incremental, universe=args.universe)
+    elif args.shard is not None:
+        path = screen_shard(args.shard, args.shards, args.run_id, args.universe, incremental, args.shard_dir)
+        print(f"Shard {args.shard} of {args.shards} written to {path}")
+        return
+    elif args.merge:
+        df = merge_shards(args.shards, args.run_id, args.universe, args.shard_dir)
+    else:
+        df = get_sharded_screen_df(args.shards, args.workers, args.universe, incremental, args.shard_dir, args.run_id)
+    print(df)
+    if args.out:
+        df.to_csv(args.out, index=False)
+
+
 if __name__ == '__main__':
-    print(get_screen_df())
+    main()
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from utils.history_store import HistoryStore, request_start
+
+
+def hourly(start, bars, tz):
+    closes = 100 + np.arange(bars, dtype=float)
+    index = pd.date_range(start, periods=bars, freq='h', tz='UTC').tz_convert(tz)
+    return pd.DataFrame({'Open': closes, 'High': closes + 1, 'Low': closes - 1, 'Close': closes,
+                         'Volume': 1e5}, index=pd.DatetimeIndex(index, name='Date'))
+
+
+def test_intraday_bars_stored_in_utc_whatever_the_download_zone(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    # The same bars, once converted to London time and once to the CET zone
+    # of another ticker in the download chunk
+    store.write('BP.L', '1h', hourly('2024-03-04 08:00', 8, 'Europe/London'), replace=True)
+    store.write('BP.L', '1h', hourly('2024-03-04 12:00', 8, 'Europe/Paris'))
+    stored = store.read('BP.L', '1h')
+    assert stored.index[0] == pd.Timestamp('2024-03-04 08:00')
+    assert stored.index.is_unique and len(stored) == 12
+    assert request_start(stored.index[-1], '1h') == pd.Timestamp('2024-03-04 19:00', tz='UTC')
+
+
+def test_daily_bars_keep_their_exchange_date(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    index = pd.date_range('2024-03-04', periods=5, freq='B', tz='Europe/Paris')
+    data = pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 1.0}, index=index)
+    store.write('MC.PA', '1d', data, replace=True)
+    assert store.read('MC.PA', '1d').index[0] == pd.Timestamp('2024-03-04')
+    assert request_start(pd.Timestamp('2024-03-04'), '1d') == pd.Timestamp('2024-03-04')
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.data_fetching import clean_stock_data
+from utils.history_store import HistoryStore
+from utils.signal_rules import RuleSet
+from utils.sma_state import IncrementalScreener, supports_incremental
+
+
+def history(bars, seed=0):
+    dates = pd.bdate_range(end='2024-06-28', periods=bars)
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, bars)))
+    return pd.DataFrame({'Open': closes, 'High': closes * 1.01, 'Low': closes * 0.99, 'Close': closes,
+                         'Volume': 1e6}, index=pd.DatetimeIndex(dates, name='Date'))
+
+
+def test_tail_bar_reclassified_as_outlier_reseeds(tmp_path):
+    data = history(320)
+    # A 60% print five bars from the end is too close to the edge to flag
+    # when first written, and is flagged once later bars arrive
+    data.iloc[-15, :4] *= 1.6
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    store.write('TEST', '1d', data.iloc[:-10], replace=True)
+    first = store.read('TEST', '1d')
+    assert not first['Outlier'].any()
+
+    screener = IncrementalScreener()
+    screener.update('TEST', clean_stock_data(first))
+    store.write('TEST', '1d', data.iloc[-10:])
+    topped_up = store.read('TEST', '1d')
+    assert topped_up['Outlier'].sum() == 1
+
+    cleaned = clean_stock_data(topped_up)
+    incremental = screener.update('TEST', cleaned)
+    full = IncrementalScreener()
+    expected = full.update('TEST', cleaned)
+    assert incremental == expected
+    assert screener.states['TEST'].current == pytest.approx(full.states['TEST'].current)
+
+
+def test_rules_beyond_the_close_are_not_incremental():
+    rules = RuleSet([{'name': 'volume spike', 'a': 'volume', 'b': 'SMA_5', 'cross': 'above'}])
+    assert not supports_incremental(rules)
+    assert supports_incremental(RuleSet())
+    with pytest.raises(ValueError):
+        IncrementalScreener(rules)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+from utils.timeframes import resample_bars, resample_many
+
+
+def daily(bars, seed):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    index = pd.DatetimeIndex(pd.bdate_range(end='2024-06-26', periods=bars), name='Date')
+    return pd.DataFrame({'open': closes, 'high': closes * 1.01, 'low': closes * 0.99, 'close': closes,
+                         'volume': rng.integers(1, 1000, bars).astype(float)}, index=index)
+
+
+def test_resample_many_matches_resample_bars():
+    histories = {'A': daily(300, 0), 'B': daily(40, 1), 'C': daily(0, 2)}
+    histories['D'] = daily(60, 3)
+    histories['D'].iloc[10, 1] = np.nan
+    # A missing week, as after a long trading halt
+    histories['E'] = daily(80, 4).drop(pd.bdate_range('2024-05-06', '2024-05-10'))
+    resampled = resample_many(histories, 'W-FRI')
+    assert set(resampled) == set(histories)
+    for ticker, data in histories.items():
+        pd.testing.assert_frame_equal(resampled[ticker], resample_bars(data, 'W-FRI'), check_freq=False)
@@ -0,0 +1,160 @@
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from utils.metrics import FETCH_RETRIES_TOTAL, FETCH_FAILURES_TOTAL
+
+YAHOO_HOST = 'query2.finance.yahoo.com'
+
+FETCH_CONCURRENCY = int(os.environ.get('SMP_FETCH_CONCURRENCY', 16))
+# Requests per second allowed per host, and how many may go out in a burst
+FETCH_RATE = float(os.environ.get('SMP_FETCH_RATE', 20))
+FETCH_BURST = float(os.environ.get('SMP_FETCH_BURST', 40))
+FETCH_RETRIES = int(os.environ.get('SMP_FETCH_RETRIES', 3))
+FETCH_BACKOFF = float(os.environ.get('SMP_FETCH_BACKOFF', 0.5))
+FETCH_MAX_BACKOFF = 30.0
+
+
+class TokenBucket:
+    # Reservation based, so it can be shared by event loops in different
+    # threads: a caller takes its tokens up front and sleeps off any deficit
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    async def acquire(self, cost=1):
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+# Fraction of the rate limits this process may use, for when several
+# processes on one machine fetch from the same host
+_rate_share = 1.0
+
+
+def get_bucket(host, rate=None, capacity=None):
+    # One bucket per host for the whole process, so concurrent scans share it
+    with _buckets_lock:
+        if host not in _buckets:
+            rate = FETCH_RATE * _rate_share if rate is None else rate
+            capacity = max(FETCH_BURST * _rate_share, 1) if capacity is None else capacity
+            _buckets[host] = TokenBucket(rate, capacity)
+        return _buckets[host]
+
+
+def set_rate_share(share):
+    # Buckets made after this use `share` of FETCH_RATE and FETCH_BURST
+    global _rate_share
+    with _buckets_lock:
+        _rate_share = share
+        _buckets.clear()
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(host, concurrency=FETCH_CONCURRENCY):
+    # Worker threads live as long as the process, one pool per host. HTTP
+    # sessions keep a connection per thread, so reusing the threads keeps
+    # those connections alive from one fetch to the next.
+    with _executors_lock:
+        key = (host, concurrency)
+        if key not in _executors:
+            _executors[key] = concurrent.futures.ThreadPoolExecutor(concurrency, thread_name_prefix=f'fetch-{host}')
+        return _executors[key]
+
+
+def _reset_after_fork():
+    # A forked child has none of the parent's threads
+    global _executors, _executors_lock
+    _executors, _executors_lock = {}, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class FetchError(Exception):
+    def __init__(self, key, error, attempts):
+        super().__init__(f"{key}: {error!r} after {attempts} attempt(s)")
+        self.key = key
+        self.error = error
+        self.attempts = attempts
+
+
+class AsyncFetcher:
+    # Runs blocking fetch functions (yfinance is synchronous) on worker
+    # threads from an event loop, with a cap on requests in flight, a per-host
+    # token bucket and jittered exponential retry
+    def __init__(self, concurrency=FETCH_CONCURRENCY, retries=FETCH_RETRIES,
+                 backoff=FETCH_BACKOFF, max_backoff=FETCH_MAX_BACKOFF, host=YAHOO_HOST):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host = host
+
+    async def _fetch_one(self, executor, semaphore, fn, item, key, cost):
+        bucket = get_bucket(self.host)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                FETCH_RETRIES_TOTAL.inc(host=self.host)
+                # Full jitter keeps retries from arriving in lockstep
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            async with semaphore:
+                await bucket.acquire(cost(item))
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, fn, item)
+                except Exception as e:
+                    error = e
+        FETCH_FAILURES_TOTAL.inc(host=self.host)
+        raise FetchError(key, error, self.retries + 1)
+
+    async def gather(self, items, fn, key=None, cost=None):
+        key = key or (lambda item: item)
+        cost = cost or (lambda item: 1)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        items = list(items)
+        keys = [key(item) for item in items]
+        # Own pool sized to the concurrency limit; the loop's default one is capped at 32
+        executor = get_executor(self.host, self.concurrency)
+        outcomes = await asyncio.gather(
+            *(self._fetch_one(executor, semaphore, fn, item, k, cost) for item, k in zip(items, keys)),
+            return_exceptions=True
+        )
+        results, errors = {}, {}
+        for k, outcome in zip(keys, outcomes):
+            if isinstance(outcome, BaseException):
+                errors[k] = outcome
+            else:
+                results[k] = outcome
+        return results, errors
+
+    def run(self, items, fn, key=None, cost=None):
+        # Returns ({key: result}, {key: FetchError}); key defaults to the item
+        return asyncio.run(self.gather(items, fn, key=key, cost=cost))
+
+
+def report_errors(errors, what):
+    for key, error in errors.items():
+        print(f"Error fetching {what} for {key}:", error)
@@ -1,33 +1,201 @@
+import os
+import time
+import pandas as pd
+import talib
+from utils.market_data import get_provider, period_start
+from utils.history_store import get_history_store, request_start, stored_index
+from utils.earnings_store import get_earnings_store, fetch_earnings
+from utils.fundamentals_store import get_fundamentals, get_fundamentals_store, FUNDAMENTALS_MAX_AGE
+from utils.async_fetch import AsyncFetcher, report_errors
+from utils.lru_cache import SizedLRUCache
+from utils.metrics import stage
 
-from utils.yfinance_data import Yfinance
+# Stored bars younger than this are served without a network top-up
+STORE_MAX_AGE = int(os.environ.get('SMP_STORE_MAX_AGE', 15 * 60))
 
-def calculate_z_scores(df):
-    return (df - df.mean()) / df.std()
+# Full daily history with SMAs plus info per ticker, shared by the chart and
+# info table callbacks
+TICKER_CACHE_BYTES = int(os.environ.get('SMP_TICKER_CACHE_MB', 256)) * 1024 * 1024
+TICKER_CACHE_TTL = int(os.environ.get('SMP_TICKER_CACHE_TTL', 15 * 60))
+ticker_cache = SizedLRUCache(TICKER_CACHE_BYTES, TICKER_CACHE_TTL)
 
-def fetch_stock_data_yahoo(ticker, period, interval):
-    test = Yfinance([ticker])
-    data = test.fetch_stock_data(ticker, period, interval)
-    z_scores = data[['Open', 'High', 'Low', 'Close']].apply(calculate_z_scores)
-    outliers = (z_scores.abs() > 6).any(axis=1)
-    data = data.loc[~outliers]
-    info = test.get_stock_info(ticker)
-    info['next_earning_date'] = get_next_earning_date(ticker)
+def is_covered(covered_start, start):
+    if covered_start is None:
+        return True
+    return start is not None and covered_start <= start
+
+def has_corporate_actions(data, after, interval):
+    # Dividends and splits re-adjust every earlier bar, so stored history
+    # is stale once one shows up in a top-up
+    actions = [column for column in ('Dividends', 'Stock Splits') if column in data.columns]
+    if not actions or data.empty:
+        return False
+    new_rows = data.loc[stored_index(data.index, interval) > after, actions]
+    return bool((new_rows.fillna(0) != 0).any(axis=None))
+
+def load_stock_history(ticker, period, interval, source=None):
+    store = get_history_store()
+    start = period_start(period)
+    coverage = store.coverage(ticker, interval)
+    if coverage is None or not is_covered(coverage[0], start):
+        source = source or get_provider()
+        with stage('history'):
+            data = source.fetch_stock_data(ticker, period, interval)
+        store.write(ticker, interval, data, start=start, replace=True)
+    elif time.time() - coverage[1] > STORE_MAX_AGE:
+        source = source or get_provider()
+        last_date = store.last_date(ticker, interval)
+        if last_date is None:
+            with stage('history'):
+                data = source.fetch_stock_data(ticker, period, interval)
+            store.write(ticker, interval, data, start=start, replace=True)
+        else:
+            # Re-request the last stored bar too, it may have been a partial session
+            with stage('history'):
+                data = source.fetch_stock_data(ticker, period, interval,
+                                               start=request_start(last_date, interval))
+            if has_corporate_actions(data, last_date, interval):
+                covered_start = coverage[0]
+                with stage('history'):
+                    if covered_start is None:
+                        data = source.fetch_stock_data(ticker, 'max', interval)
+                    else:
+                        data = source.fetch_stock_data(ticker, period, interval,
+                                                       start=request_start(covered_start, interval))
+                store.write(ticker, interval, data, start=covered_start, replace=True)
+            else:
+                store.write(ticker, interval, data)
+    with stage('store_read'):
+        return store.read(ticker, interval, start)
+
+def load_stock_history_batch(tickers, period, interval, source=None, errors=None):
+    # Failed tickers are not written, so they are retried on the next call,
+    # and keep whatever was stored before
+    errors = {} if errors is None else errors
+    store = get_history_store()
+    start = period_start(period)
+    now = time.time()
+    full, deltas = [], {}
+    with stage('store_read'):
+        coverages, last_dates = store.coverage_many(tickers, interval)
+    for ticker in tickers:
+        coverage = coverages.get(ticker)
+        if coverage is None or not is_covered(coverage[0], start):
+            full.append(ticker)
+        elif now - coverage[1] > STORE_MAX_AGE:
+            last_date = last_dates.get(ticker)
+            if last_date is None:
+                full.append(ticker)
+            else:
+                # Most tickers share the same last date, so group them into one batch per date
+                deltas.setdefault(last_date, []).append(ticker)
+
+    if full or deltas:
+        source = source or get_provider()
+    if full:
+        with stage('history'):
+            histories = source.download_history(full, period, interval, errors=errors)
+        for ticker, data in histories.items():
+            store.write(ticker, interval, data, start=start, replace=True)
+    refetch = {}
+    for last_date, group in deltas.items():
+        with stage('history'):
+            histories = source.download_history(group, period, interval, start=request_start(last_date, interval),
+                                                errors=errors)
+        for ticker, data in histories.items():
+            if has_corporate_actions(data, last_date, interval):
+                refetch.setdefault(coverages[ticker][0], []).append(ticker)
+            else:
+                store.write(ticker, interval, data)
+    for covered_start, group in refetch.items():
+        with stage('history'):
+            if covered_start is None:
+                histories = source.download_history(group, 'max', interval, errors=errors)
+            else:
+                histories = source.download_history(group, period, interval,
+                                                    start=request_start(covered_start, interval), errors=errors)
+        for ticker, data in histories.items():
+            store.write(ticker, interval, data, start=covered_start, replace=True)
+
+    with stage('store_read'):
+        histories = store.read_many(tickers, interval, start)
+        # Tickers with nothing stored get the empty frame read() gives
+        return {ticker: histories[ticker] if ticker in histories else store.read(ticker, interval, start)
+                for ticker in tickers}
+
+def clean_stock_data(data):
+    # Outliers were flagged once when the bars were stored (utils/outliers.py),
+    # so the screen and the chart drop the same bars whatever the period
+    if 'Outlier' in data.columns:
+        data = data.loc[~data['Outlier']]
     data = data.rename(columns={'Date': 'date', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'})
     data = data[["open", "high", "low", "close", "volume"]]
     data = data.tz_localize(None)
+    return data
+
+def fetch_stock_history_batch(tickers, period, interval, errors=None):
+    histories = load_stock_history_batch(tickers, period, interval, errors=errors)
+    return {ticker: clean_stock_data(data) for ticker, data in histories.items()}
+
+def fetch_stock_history_yahoo(ticker, period, interval):
+    data = load_stock_history(ticker, period, interval)
+    return clean_stock_data(data)
+
+def fetch_stock_data_yahoo(ticker, period, interval):
+    test = get_provider()
+    data = load_stock_history(ticker, period, interval, source=test)
+    data = clean_stock_data(data)
+    info, _ = get_fundamentals(ticker, max_age=FUNDAMENTALS_MAX_AGE, source=test)
+    info = dict(info, next_earning_date=get_next_earning_date(ticker, source=test))
     return data, info
 
+def fetch_ticker_data_cached(ticker):
+    # (daily 'max' history with SMA_30/50/200, info); callers slice it per
+    # period and must not modify it
+    def load():
+        data, info = fetch_stock_data_yahoo(ticker, 'max', '1d')
+        with stage('indicators'):
+            data['SMA_30'] = talib.SMA(data['close'], timeperiod=30)
+            data['SMA_50'] = talib.SMA(data['close'], timeperiod=50)
+            data['SMA_200'] = talib.SMA(data['close'], timeperiod=200)
+        return data, info
+    return ticker_cache.get_or_load(ticker, load)
+
 def fetch_stock_info_yahoo(ticker):
-    test = Yfinance([ticker])
-    info = test.get_stock_info(ticker)
-    info['next_earning_date'] = get_next_earning_date(ticker)
-    return info
-
-def get_next_earning_date(ticker):
-    test = Yfinance([ticker])
-    earnings = test.get_stock_calendar(ticker)
-    if "Earnings Date" not in earnings:
+    # Projected fields from the fundamentals store, refetched once the
+    # snapshot is older than FUNDAMENTALS_MAX_AGE
+    info, _ = get_fundamentals(ticker, max_age=FUNDAMENTALS_MAX_AGE)
+    return dict(info, next_earning_date=get_next_earning_date(ticker))
+
+def fetch_stock_info_batch(tickers, errors=None):
+    # The .info requests go out through the rate limited fetcher. Failed
+    # tickers are reported in `errors`.
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    test = get_provider()
+
+    def fetch(ticker):
+        with stage('info'):
+            return test.get_stock_info(ticker)
+
+    infos, failed = AsyncFetcher(host=test.host).run(tickers, fetch)
+    # Fresh payloads are worth keeping for the info table
+    get_fundamentals_store().write_many(infos)
+    if errors is not None:
+        errors.update(failed)
+    else:
+        report_errors(failed, 'info')
+    return infos
+
+def get_next_earning_date(ticker, source=None):
+    # From the earnings store, which the background refresh keeps current;
+    # only a ticker it has never seen is fetched here
+    store = get_earnings_store()
+    if store.get(ticker) is None:
+        fetch_earnings(ticker, source=source, store=store)
+    next_earning_date = store.next_earnings(ticker)
+    if not next_earning_date:
         return '-'
-    next_earning_date = earnings['Earnings Date']
     next_earning_date = ' - '.join(map(lambda x: x.strftime('%b %d, %Y'), next_earning_date))
     return next_earning_date
@@ -2,15 +2,27 @@ import pandas as pd
 from datetime import timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from utils.downsample import downsample_line, downsample_bars
 
 
-def get_rangebreaks(index):
+def get_rangebreaks(index, compact=False):
     # Convert the index to a series so we can use diff
     s = pd.Series(index)
 
     # Find the gaps in the index where the difference between two dates is more than 1 day
     gaps = s[s.diff() > pd.Timedelta(days=1)]
 
+    if compact:
+        # One weekend pattern instead of a break per weekend; only the other
+        # gaps (holidays, suspensions) are listed. Keeps long histories small.
+        previous = s.shift(1)
+        weekend = (previous.dt.dayofweek == 4) & (s - previous == pd.Timedelta(days=3))
+        gaps = gaps[~weekend.loc[gaps.index]]
+        return [{"bounds": ["sat", "mon"]}] + [
+            {"bounds": [s.iloc[idx - 1] + pd.Timedelta(days=1), s.iloc[idx]]}
+            for idx in gaps.index
+        ]
+
     # Create range breaks for each gap
     rangebreaks = [
         {
@@ -29,7 +41,12 @@ def convert_to_trillion(number):
     return f"{trillion:.2f} trillion"
 
 
-def create_stock_chart(data, ticker, stock_info):
+def create_stock_chart(data, ticker, stock_info, max_points=None):
+    # With max_points, lines are reduced with LTTB and volume with per-bucket
+    # maxima, so the figure size follows the chart width, not the history length
+    downsample = max_points is not None and len(data) > max_points
+    close = downsample_line(data["close"], max_points) if downsample else data["close"]
+    volume = downsample_bars(data["volume"], max_points) if downsample else data["volume"]
 
     # Create subplots
     num_subplots = 2
@@ -48,8 +65,8 @@ def create_stock_chart(data, ticker, stock_info):
 
     fig.add_trace(
         go.Scatter(
-            x=data.index,
-            y=data["close"],
+            x=close.index,
+            y=close,
             name=ticker,
             mode="lines",
             line=dict(color="white"),
@@ -78,10 +95,11 @@ def create_stock_chart(data, ticker, stock_info):
     for ma, color in ma_colors.items():
         ma_column = f"SMA_{ma}"
         if ma_column in data.columns:
+            ma_data = downsample_line(data[ma_column], max_points) if downsample else data[ma_column]
             fig.add_trace(
                 go.Scatter(
-                    x=data.index,
-                    y=data[ma_column],
+                    x=ma_data.index,
+                    y=ma_data,
                     mode="lines",
                     name=f"{ma}-day SMA",
                     line=dict(color=color),
@@ -93,7 +111,7 @@ def create_stock_chart(data, ticker, stock_info):
 
     # Add volume to the second row
     fig.add_trace(
-        go.Bar(x=data.index, y=data["volume"],
+        go.Bar(x=volume.index, y=volume,
                name="Volume", marker_color="#8C127C"),
         row=2,
         col=1,
@@ -127,7 +145,7 @@ def create_stock_chart(data, ticker, stock_info):
         yaxis=dict(range=[min_close, max_close])
     )
 
-    rangebreaks = get_rangebreaks(data.index)
+    rangebreaks = get_rangebreaks(data.index, compact=downsample)
     fig.update_layout(
         xaxis=dict(
             rangebreaks=rangebreaks,
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(y, threshold):
+    # Largest-Triangle-Three-Buckets: positions of `threshold` points that keep
+    # the visual shape of the line. x is the bar position, which is what the
+    # chart shows once non-trading days are removed with rangebreaks.
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(int) + 1
+    edges[-1] = n - 1
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket, or the last point for the final bucket
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_line(series, threshold):
+    # Leading NaNs (SMA warm-up) are dropped first; plotly starts the line later anyway
+    series = series.dropna()
+    if len(series) <= threshold:
+        return series
+    return series.iloc[lttb_indices(series.to_numpy(), threshold)]
+
+
+def downsample_bars(series, threshold):
+    # Largest value per bucket, placed at the bucket's first bar, so volume
+    # spikes survive and the zoomed-out bars keep their height
+    if len(series) <= threshold:
+        return series
+    starts = np.linspace(0, len(series), threshold, endpoint=False).astype(int)
+    values = np.maximum.reduceat(series.fillna(0).to_numpy(), starts)
+    return pd.Series(values, index=series.index[starts], name=series.name)
@@ -0,0 +1,122 @@
+import argparse
+import datetime as dt
+import os
+import threading
+from utils.market_data import get_provider
+from utils.metrics import stage
+from utils.scheduler import PeriodicRefresher
+from utils.snapshot_store import SnapshotStore, refresh_snapshots
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EARNINGS_PATH = os.environ.get(
+    'SMP_EARNINGS_PATH', os.path.join(BASE_DIR, 'data', 'earnings.sqlite'))
+# Earnings dates move a few times a quarter at most; one refresh a day is plenty
+EARNINGS_MAX_AGE = int(os.environ.get('SMP_EARNINGS_MAX_AGE', 24 * 60 * 60))
+# Calendar requests in flight during a refresh, kept low so a refresh never
+# crowds out a scan; both share the host's rate limit
+EARNINGS_CONCURRENCY = int(os.environ.get('SMP_EARNINGS_CONCURRENCY', 4))
+# The screen table highlights tickers reporting within this many days
+EARNINGS_SOON_DAYS = int(os.environ.get('SMP_EARNINGS_SOON_DAYS', 14))
+
+
+class EarningsStore(SnapshotStore):
+    # Upcoming earnings dates per ticker, so lookups from the screen and the
+    # info table never make a request. Stored as ISO date strings.
+    table = 'earnings'
+    max_age = EARNINGS_MAX_AGE
+
+    def __init__(self, path=EARNINGS_PATH):
+        super().__init__(path)
+
+    def encode(self, dates):
+        return [day.isoformat() for day in sorted(dates)]
+
+    def decode(self, data):
+        # Sorted earnings dates
+        return [dt.date.fromisoformat(day) for day in data]
+
+    def next_earnings(self, ticker, today=None):
+        # The earnings dates still ahead, or [] when none are known
+        dates = self.get(ticker) or []
+        today = today or dt.date.today()
+        return [day for day in dates if day >= today]
+
+    def days_until(self, ticker, today=None):
+        today = today or dt.date.today()
+        upcoming = self.next_earnings(ticker, today)
+        return (upcoming[0] - today).days if upcoming else None
+
+
+def calendar_earnings_dates(calendar):
+    # Ticker.calendar gives one date, or a low and high estimate
+    dates = (calendar or {}).get('Earnings Date') or []
+    if not isinstance(dates, (list, tuple)):
+        dates = [dates]
+    return [day.date() if isinstance(day, dt.datetime) else day for day in dates]
+
+
+def fetch_earnings(ticker, source=None, store=None):
+    # One ticker on demand, for tickers the daily refresh has not reached yet
+    source = source or get_provider()
+    store = store or get_earnings_store()
+    with stage('calendar'):
+        dates = calendar_earnings_dates(source.get_stock_calendar(ticker))
+    store.write_many({ticker: dates})
+    return store.get(ticker)
+
+
+def refresh_earnings(tickers=None, force=False, store=None, source=None, errors=None):
+    # Calendars for the tickers that are due; see refresh_snapshots
+    store = store or get_earnings_store()
+    source = source or get_provider()
+
+    def fetch(ticker):
+        with stage('calendar'):
+            return calendar_earnings_dates(source.get_stock_calendar(ticker))
+
+    return refresh_snapshots(store, fetch, source.host, tickers, force, concurrency=EARNINGS_CONCURRENCY,
+                             errors=errors, what='earnings calendar')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_earnings_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EarningsStore()
+        return _store
+
+
+def set_earnings_store(store):
+    # Replace the shared store, e.g. with one on a scratch path; None goes
+    # back to the default on the next get_earnings_store()
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# Background refresh of the whole universe. It wakes every EARNINGS_MAX_AGE
+# and only fetches tickers that are due, so restarting the app doesn't
+# refetch what was refreshed today.
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def get_earnings_refresher():
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = PeriodicRefresher(refresh_earnings, EARNINGS_MAX_AGE, name='earnings-refresher')
+        return _refresher
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the stored earnings calendar')
+    parser.add_argument('tickers', nargs='*', help='tickers to refresh (default: every listed ticker)')
+    parser.add_argument('--force', action='store_true', help='refetch tickers refreshed within the last day too')
+    args = parser.parse_args()
+    count = refresh_earnings(args.tickers or None, force=args.force)
+    print(f"Refreshed earnings dates for {count} tickers")
@@ -0,0 +1,122 @@
+import argparse
+import os
+import threading
+import time
+from utils.market_data import get_provider
+from utils.metrics import stage
+from utils.scheduler import PeriodicRefresher
+from utils.snapshot_store import SnapshotStore, refresh_snapshots
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNDAMENTALS_PATH = os.environ.get(
+    'SMP_FUNDAMENTALS_PATH', os.path.join(BASE_DIR, 'data', 'fundamentals.sqlite'))
+# Snapshots older than this are refetched by the background refresh; the
+# screen also writes fresh ones for every ticker it hits
+FUNDAMENTALS_MAX_AGE = int(os.environ.get('SMP_FUNDAMENTALS_MAX_AGE', 24 * 60 * 60))
+FUNDAMENTALS_CONCURRENCY = int(os.environ.get('SMP_FUNDAMENTALS_CONCURRENCY', 4))
+
+# The .info fields anything here reads. The rest of the payload (well over
+# a hundred fields) is dropped on the way in.
+FUNDAMENTAL_FIELDS = (
+    'longName',
+    'sector',
+    'industry',
+    'currency',
+    'currentPrice',
+    'previousClose',
+    'open',
+    'marketCap',
+    'beta',
+    'dividendRate',
+    'dividendYield',
+    'exDividendDate',
+    'targetMeanPrice',
+)
+
+
+def project(info):
+    # Fields missing from the payload stay missing, as they would in .info.
+    # numpy scalars become plain values json can store.
+    return {field: info[field].item() if hasattr(info[field], 'item') else info[field]
+            for field in FUNDAMENTAL_FIELDS if info.get(field) is not None}
+
+
+class FundamentalsStore(SnapshotStore):
+    # Projected .info snapshots per ticker. write_many takes whole .info
+    # payloads; get gives the projected fields.
+    table = 'fundamentals'
+    max_age = FUNDAMENTALS_MAX_AGE
+
+    def __init__(self, path=FUNDAMENTALS_PATH):
+        super().__init__(path)
+
+    def encode(self, info):
+        return project(info)
+
+
+def get_fundamentals(ticker, max_age=None, source=None, store=None):
+    # (fields, fetched at), fetching the ticker now if it has no snapshot or,
+    # with max_age, one older than that
+    store = store or get_fundamentals_store()
+    snapshot = store.entry(ticker)
+    if snapshot is None or (max_age is not None and time.time() - snapshot[1] > max_age):
+        source = source or get_provider()
+        with stage('info'):
+            info = source.get_stock_info(ticker)
+        store.write_many({ticker: info})
+        snapshot = store.entry(ticker)
+    return snapshot
+
+
+def refresh_fundamentals(tickers=None, force=False, store=None, source=None, errors=None):
+    # .info for the tickers that are due; see refresh_snapshots
+    store = store or get_fundamentals_store()
+    source = source or get_provider()
+
+    def fetch(ticker):
+        with stage('info'):
+            return source.get_stock_info(ticker)
+
+    return refresh_snapshots(store, fetch, source.host, tickers, force, concurrency=FUNDAMENTALS_CONCURRENCY,
+                             errors=errors, what='fundamentals')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fundamentals_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FundamentalsStore()
+        return _store
+
+
+def set_fundamentals_store(store):
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# Background refresh of the whole universe, alongside the earnings one
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def get_fundamentals_refresher():
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = PeriodicRefresher(refresh_fundamentals, FUNDAMENTALS_MAX_AGE,
+                                           name='fundamentals-refresher')
+        return _refresher
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the stored fundamentals snapshots')
+    parser.add_argument('tickers', nargs='*', help='tickers to refresh (default: every listed ticker)')
+    parser.add_argument('--force', action='store_true', help='refetch tickers refreshed within the last day too')
+    args = parser.parse_args()
+    count = refresh_fundamentals(args.tickers or None, force=args.force)
+    print(f"Refreshed fundamentals for {count} tickers")
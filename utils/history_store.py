@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from utils.metrics import stage
+from utils.outliers import outlier_mask, OUTLIER_TAIL, OUTLIER_WINDOW
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_PATH = os.environ.get(
+    'SMP_STORE_PATH', os.path.join(BASE_DIR, 'data', 'history.sqlite'))
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Tickers per read_many query, under SQLite's default limit of 999 variables
+READ_BATCH_SIZE = 500
+
+
+class HistoryStore:
+    # Per-ticker OHLCV bars kept on disk so a scan only has to download the
+    # bars after the last stored date. Bad prints are flagged in the outlier
+    # column as bars are written, so readers filter instead of recomputing.
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bars ('
+                'ticker TEXT NOT NULL, interval TEXT NOT NULL, date TEXT NOT NULL, '
+                'open REAL, high REAL, low REAL, close REAL, volume REAL, '
+                'outlier INTEGER NOT NULL DEFAULT 0, '
+                'PRIMARY KEY (ticker, interval, date)) WITHOUT ROWID'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(bars)')]
+            if 'outlier' not in columns:
+                conn.execute('ALTER TABLE bars ADD COLUMN outlier INTEGER NOT NULL DEFAULT 0')
+                self._classify_all(conn)
+            # start is the earliest date the stored bars are complete from,
+            # NULL when the full ('max') history has been stored
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS coverage ('
+                'ticker TEXT NOT NULL, interval TEXT NOT NULL, start TEXT, '
+                'updated_at REAL NOT NULL, PRIMARY KEY (ticker, interval))'
+            )
+            # Intraday bars used to be stored in the timezone of whichever
+            # download chunk they came in; they are dropped once so the next
+            # scan downloads them again in UTC
+            if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                for table in ('bars', 'coverage'):
+                    conn.execute(f"DELETE FROM {table} WHERE interval LIKE '%m' OR interval LIKE '%h'")
+                conn.execute('PRAGMA user_version = 1')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _classify_all(self, conn):
+        # One-off for stores written before outliers were flagged
+        series = conn.execute('SELECT DISTINCT ticker, interval FROM bars').fetchall()
+        for ticker, interval in series:
+            rows = conn.execute(
+                'SELECT date, open, high, low, close FROM bars '
+                'WHERE ticker = ? AND interval = ? ORDER BY date', (ticker, interval)
+            ).fetchall()
+            data = pd.DataFrame(rows, columns=['Date'] + PRICE_COLUMNS[:4])
+            flagged = data['Date'][outlier_mask(data)]
+            conn.executemany('UPDATE bars SET outlier = 1 WHERE ticker = ? AND interval = ? AND date = ?',
+                             [(ticker, interval, date) for date in flagged])
+
+    def coverage(self, ticker, interval):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT start, updated_at FROM coverage WHERE ticker = ? AND interval = ?',
+                (ticker, interval)
+            ).fetchone()
+        if row is None:
+            return None
+        start = pd.Timestamp(row[0]) if row[0] is not None else None
+        return start, row[1]
+
+    def last_date(self, ticker, interval):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT MAX(date) FROM bars WHERE ticker = ? AND interval = ?',
+                (ticker, interval)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return pd.Timestamp(row[0])
+
+    def coverage_many(self, tickers, interval):
+        # {ticker: (start, updated_at)} for the tickers with coverage, and
+        # {ticker: last stored date} for those with bars, a batch per query
+        tickers = list(dict.fromkeys(tickers))
+        coverage, last_dates = {}, {}
+        with closing(self._connect()) as conn:
+            for i in range(0, len(tickers), READ_BATCH_SIZE):
+                batch = tickers[i:i + READ_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                for ticker, start, updated_at in conn.execute(
+                        f'SELECT ticker, start, updated_at FROM coverage '
+                        f'WHERE ticker IN ({placeholders}) AND interval = ?', batch + [interval]):
+                    coverage[ticker] = (pd.Timestamp(start) if start is not None else None, updated_at)
+                for ticker, date in conn.execute(
+                        f'SELECT ticker, MAX(date) FROM bars '
+                        f'WHERE ticker IN ({placeholders}) AND interval = ? GROUP BY ticker', batch + [interval]):
+                    last_dates[ticker] = pd.Timestamp(date)
+        return coverage, last_dates
+
+    def read(self, ticker, interval, start=None):
+        # Bars with an Outlier column; clean_stock_data drops the flagged ones
+        query = ('SELECT date, open, high, low, close, volume, outlier FROM bars '
+                 'WHERE ticker = ? AND interval = ?')
+        params = [ticker, interval]
+        if start is not None:
+            query += ' AND date >= ?'
+            params.append(_format_date(start))
+        query += ' ORDER BY date'
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        data = pd.DataFrame(rows, columns=['Date'] + PRICE_COLUMNS + ['Outlier'])
+        data['Date'] = pd.to_datetime(data['Date'])
+        data['Outlier'] = data['Outlier'].astype(bool)
+        return data.set_index('Date')
+
+    def read_many(self, tickers, interval, start=None):
+        # One query per READ_BATCH_SIZE tickers; {ticker: frame} for those
+        # with stored bars. The (ticker, interval, date) primary key serves
+        # the lookups, so only the requested tickers' bars are read.
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        frames = []
+        with closing(self._connect()) as conn:
+            for i in range(0, len(tickers), READ_BATCH_SIZE):
+                batch = tickers[i:i + READ_BATCH_SIZE]
+                query = ('SELECT ticker, date, open, high, low, close, volume, outlier FROM bars '
+                         f'WHERE ticker IN ({", ".join("?" * len(batch))}) AND interval = ?')
+                params = batch + [interval]
+                if start is not None:
+                    query += ' AND date >= ?'
+                    params.append(_format_date(start))
+                query += ' ORDER BY ticker, date'
+                frames.append(pd.read_sql_query(query, conn, params=params))
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        data.columns = ['ticker', 'Date'] + PRICE_COLUMNS + ['Outlier']
+        data['Date'] = pd.to_datetime(data['Date'])
+        data['Outlier'] = data['Outlier'].astype(bool)
+        # Rows come sorted by ticker, so each ticker is one contiguous slice
+        names = data.pop('ticker').to_numpy()
+        data = data.set_index('Date')
+        bounds = np.flatnonzero(names[1:] != names[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(names)]))
+        return {names[a]: data.iloc[a:b] for a, b in zip(starts, ends) if b > a}
+
+    def _tail(self, conn, ticker, interval, before):
+        # The last OUTLIER_WINDOW stored bars before a top-up, oldest first
+        rows = conn.execute(
+            'SELECT date, open, high, low, close, volume FROM bars '
+            'WHERE ticker = ? AND interval = ? AND date < ? ORDER BY date DESC LIMIT ?',
+            (ticker, interval, _format_date(before), OUTLIER_WINDOW)
+        ).fetchall()
+        data = pd.DataFrame(rows[::-1], columns=['Date'] + PRICE_COLUMNS)
+        data['Date'] = pd.to_datetime(data['Date'])
+        return data.set_index('Date')
+
+    def write(self, ticker, interval, data, start=None, replace=False):
+        # data is a yfinance history frame; start is the coverage start the
+        # frame was requested with (None for 'max')
+        frame = pd.DataFrame(columns=PRICE_COLUMNS, dtype=float)
+        if data is not None and not data.empty:
+            frame = data[PRICE_COLUMNS].astype(float)
+            frame.index = stored_index(frame.index, interval)
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            keep = 0
+            if not replace and not frame.empty:
+                # The last stored bars get new neighbours, so they are
+                # classified again along with the new ones
+                tail = self._tail(conn, ticker, interval, frame.index[0])
+                if not tail.empty:
+                    frame = pd.concat([tail, frame])
+                    keep = len(tail) - min(len(tail), OUTLIER_TAIL)
+            with stage('outliers'):
+                flagged = outlier_mask(frame)
+            rows = [
+                (ticker, interval, _format_date(date), *map(_to_sql, row), int(outlier))
+                for date, row, outlier in zip(frame.index[keep:], frame.to_numpy()[keep:], flagged[keep:])
+            ]
+            if replace:
+                conn.execute('DELETE FROM bars WHERE ticker = ? AND interval = ?',
+                             (ticker, interval))
+            conn.executemany(
+                'INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            if replace:
+                conn.execute(
+                    'INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)',
+                    (ticker, interval, _format_date(start) if start is not None else None, time.time())
+                )
+            else:
+                conn.execute(
+                    'UPDATE coverage SET updated_at = ? WHERE ticker = ? AND interval = ?',
+                    (time.time(), ticker, interval)
+                )
+
+
+def is_intraday(interval):
+    # '1h', '30m', ... as opposed to '1d', '1wk', '1mo'
+    return interval.endswith(('m', 'h'))
+
+
+def stored_index(index, interval):
+    # The naive index bars are stored under: intraday bars in UTC, so a bar
+    # gets the same time whichever exchange's zone it was downloaded in;
+    # daily and longer bars on their exchange-local date
+    if getattr(index, 'tz', None) is None:
+        return index
+    if is_intraday(interval):
+        index = index.tz_convert('UTC')
+    return index.tz_localize(None)
+
+
+def request_start(date, interval):
+    # A stored date as the start of a provider request. yfinance reads naive
+    # times as exchange-local, so intraday starts are marked as UTC.
+    if date is None or not is_intraday(interval):
+        return date
+    return pd.Timestamp(date).tz_localize('UTC')
+
+
+def _format_date(date):
+    return pd.Timestamp(date).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _to_sql(value):
+    return None if pd.isna(value) else float(value)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
+
+
+def set_history_store(store):
+    # Replace the shared store, e.g. with one on a scratch path; None goes
+    # back to the default on the next get_history_store()
+    global _store
+    with _store_lock:
+        _store = store
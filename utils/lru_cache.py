@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import pandas as pd
+
+
+def estimate_size(value):
+    # Rough in-memory size in bytes, good enough to budget the cache
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class SizedLRUCache:
+    # LRU cache bounded by the estimated size of its values rather than their
+    # count, with a TTL per entry. get_or_load lets concurrent callers for the
+    # same key share one load.
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires = entry
+        if expires <= time.time():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _pop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._get(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value, ttl=None):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.time() + (self.ttl if ttl is None else ttl))
+            self.size += size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def get_or_load(self, key, load):
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                return entry[0]
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = Future()
+                self._inflight[key] = flight
+        if not owner:
+            return flight.result()
+        try:
+            value = load()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.set_exception(e)
+            raise
+        self.put(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.set_result(value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.size = 0
+            elif key in self._entries:
+                self._pop(key)
@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+from utils.async_fetch import AsyncFetcher, YAHOO_HOST
+
+HISTORY_CHUNK_SIZE = 100
+
+# Which backend get_provider() builds: 'yahoo' (live) or 'replay' (recorded
+# responses on disk, see utils/replay_data.py)
+PROVIDER = os.environ.get('SMP_PROVIDER', 'yahoo')
+
+# Periods as yfinance takes them: 'max', 'ytd', or a count of days, weeks,
+# months or years ('5d', '730d', '1wk', '3mo', '10y')
+PERIOD_PATTERN = re.compile(r'(\d+)(d|wk|mo|y)')
+PERIOD_UNITS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+def period_start(period):
+    # The first date `period` reaches back to from today, None for 'max'
+    today = pd.Timestamp.today().normalize()
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return today.replace(month=1, day=1)
+    match = PERIOD_PATTERN.fullmatch(period)
+    if match is None:
+        raise ValueError(f"Unknown period {period!r}")
+    return today - pd.DateOffset(**{PERIOD_UNITS[match[2]]: int(match[1])})
+
+
+class MarketDataProvider(ABC):
+    # Everything the screener and app read from a market data source.
+    # History frames are indexed by date with yfinance's columns (Open, High,
+    # Low, Close, Volume, and Dividends / Stock Splits where available).
+    host = YAHOO_HOST
+    history_chunk_size = HISTORY_CHUNK_SIZE
+
+    @abstractmethod
+    def fetch_stock_data(self, ticker, period, interval, start=None):
+        pass
+
+    @abstractmethod
+    def get_stock_info(self, ticker):
+        pass
+
+    @abstractmethod
+    def get_stock_calendar(self, ticker):
+        pass
+
+    @abstractmethod
+    def download_chunk(self, tickers, period, interval, start=None):
+        # {ticker: frame} for one chunk; frames may be empty for tickers
+        # without data. Raise to have the fetcher retry the whole chunk.
+        pass
+
+    def download_history(self, tickers, period, interval, start=None, chunk_size=None,
+                         fetcher=None, errors=None):
+        # History for many tickers, one download_chunk call per chunk through
+        # the rate limited fetcher. Tickers that fail are left out and
+        # reported in `errors`.
+        fetcher = fetcher or AsyncFetcher(host=self.host)
+        chunk_size = chunk_size or self.history_chunk_size
+        chunks = [tuple(tickers[i:i + chunk_size]) for i in range(0, len(tickers), chunk_size)]
+        results, chunk_errors = fetcher.run(
+            chunks, lambda chunk: self.download_chunk(list(chunk), period, interval, start), cost=len)
+        histories = {}
+        for chunk_histories in results.values():
+            for ticker, frame in chunk_histories.items():
+                if frame is None or frame.empty:
+                    if errors is not None:
+                        errors[ticker] = ValueError('no data returned')
+                else:
+                    histories[ticker] = frame
+        if errors is not None:
+            for chunk, error in chunk_errors.items():
+                for ticker in chunk:
+                    errors[ticker] = error
+        return histories
+
+
+def create_provider(name=PROVIDER):
+    if name == 'yahoo':
+        from utils.yfinance_data import Yfinance
+        return Yfinance()
+    if name == 'replay':
+        from utils.replay_data import ReplayProvider
+        return ReplayProvider()
+    raise ValueError(f"Unknown market data provider {name!r}")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider()
+        return _provider
+
+
+def set_provider(provider):
+    # Provider instance or backend name; None goes back to SMP_PROVIDER on
+    # the next get_provider()
+    global _provider
+    if isinstance(provider, str):
+        provider = create_provider(provider)
+    with _provider_lock:
+        _provider = provider
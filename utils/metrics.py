@@ -0,0 +1,161 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# Process-wide metrics in the Prometheus text exposition format, served on
+# /metrics by the app. Small on purpose: counters, gauges and histograms with
+# labels, and no client library to install.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+
+
+class Metric(ABC):
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    @abstractmethod
+    def samples(self):
+        # Exposition lines for every labelled value
+        pass
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{self._labels(key)} {_format(value)}' for key, value in values]
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{self._labels(key)} {_format(value)}' for key, value in values]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._labels(key, [("le", _format(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {_format(total)}')
+            lines.append(f'{self.name}_count{self._labels(key)} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render():
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+STAGE_SECONDS = Histogram('smp_stage_seconds', 'Time spent in each stage of loading and screening tickers',
+                          ['stage'])
+STAGE_ERRORS_TOTAL = Counter('smp_stage_errors_total', 'Stage calls that raised', ['stage'])
+FETCH_RETRIES_TOTAL = Counter('smp_fetch_retries_total', 'Fetches retried after an error', ['host'])
+FETCH_FAILURES_TOTAL = Counter('smp_fetch_failures_total', 'Fetches that still failed after every retry', ['host'])
+CALLBACK_SECONDS = Histogram('smp_callback_seconds', 'Dash callback run time', ['callback'])
+CALLBACK_ERRORS_TOTAL = Counter('smp_callback_errors_total', 'Dash callbacks that raised', ['callback'])
+SCANS_TOTAL = Counter('smp_scans_total', 'Screen scans by outcome', ['outcome'])
+SCAN_DURATION = Gauge('smp_scan_duration_seconds', 'Duration of the last completed screen scan')
+SCAN_LAST_SUCCESS = Gauge('smp_scan_last_success_timestamp_seconds', 'When the last screen scan completed')
+SCAN_RECORDS = Gauge('smp_scan_records', 'Rows in the last completed screen scan')
+SCAN_FETCH_ERRORS = Gauge('smp_scan_fetch_errors', 'Tickers with fetch errors in the last completed screen scan')
+
+
+@contextmanager
+def timed(histogram, errors=None, **labels):
+    # Observes the block's duration and counts exceptions in `errors`.
+    # Works as a decorator too.
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def stage(name):
+    return timed(STAGE_SECONDS, STAGE_ERRORS_TOTAL, stage=name)
+
+
+def instrument_callback(fn):
+    # Decorator for Dash callbacks, applied under @app.callback
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with timed(CALLBACK_SECONDS, CALLBACK_ERRORS_TOTAL, callback=fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,51 @@
+import os
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Bad prints are short spikes away from the surrounding bars. Each price is
+# compared with the median of a window centred on it, in log space, scaled by
+# the window's median absolute deviation. A genuine gap is not flagged: once
+# half the window is past it the median has moved to the new level.
+OUTLIER_WINDOW = int(os.environ.get('SMP_OUTLIER_WINDOW', 21))
+OUTLIER_THRESHOLD = float(os.environ.get('SMP_OUTLIER_THRESHOLD', 10))
+# Moves smaller than this are never flagged, however calm the window was
+OUTLIER_MIN_JUMP = float(os.environ.get('SMP_OUTLIER_MIN_JUMP', 0.3))
+# The latest bars only have history on one side, where a spike and a real gap
+# look alike, so they need a much bigger jump until later bars arrive
+OUTLIER_EDGE_JUMP = float(os.environ.get('SMP_OUTLIER_EDGE_JUMP', 1.0))
+
+OUTLIER_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Bars whose flags can change when new bars are appended
+OUTLIER_TAIL = OUTLIER_WINDOW // 2
+
+
+def robust_z_scores(values, window=OUTLIER_WINDOW):
+    # values: bars x columns. Returns |log(x) - rolling median| / (1.4826 * MAD)
+    # and the relative jump from the median, both NaN where undefined.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(np.where(values > 0, values, np.nan))
+    half = window // 2
+    padded = np.pad(logs, ((half, half), (0, 0)), constant_values=np.nan)
+    windows = sliding_window_view(padded, window, axis=0)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        # All-NaN windows (leading gaps) just give NaN scores
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.nanmedian(windows, axis=-1)
+        mads = np.nanmedian(np.abs(windows - medians[..., None]), axis=-1)
+        deviation = np.abs(logs - medians)
+        scores = deviation / (1.4826 * mads)
+    return scores, np.expm1(deviation)
+
+
+def outlier_mask(data, window=OUTLIER_WINDOW, threshold=OUTLIER_THRESHOLD, min_jump=OUTLIER_MIN_JUMP,
+                 edge_jump=OUTLIER_EDGE_JUMP):
+    # Boolean array, True for bars to drop. Callers reclassify the last
+    # OUTLIER_TAIL bars whenever newer bars are appended.
+    if data is None or len(data) == 0:
+        return np.zeros(0, dtype=bool)
+    values = data[OUTLIER_COLUMNS].to_numpy(dtype=float)
+    scores, jumps = robust_z_scores(values, window)
+    min_jumps = np.full((len(values), 1), min_jump)
+    min_jumps[max(len(values) - window // 2, 0):] = max(min_jump, edge_jump)
+    return ((scores > threshold) & (jumps > min_jumps)).any(axis=1)
@@ -0,0 +1,172 @@
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import threading
+import time
+import pandas as pd
+from utils.history_store import stored_index
+from utils.lru_cache import SizedLRUCache
+from utils.market_data import MarketDataProvider, get_provider, period_start
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLAY_DIR = os.environ.get('SMP_REPLAY_DIR', os.path.join(BASE_DIR, 'data', 'replay'))
+# Injected per request: a delay of latency +/- jitter seconds, and a failure
+# with probability error_rate. A seed makes the injected pattern repeatable.
+REPLAY_LATENCY = float(os.environ.get('SMP_REPLAY_LATENCY', 0))
+REPLAY_JITTER = float(os.environ.get('SMP_REPLAY_JITTER', 0))
+REPLAY_ERROR_RATE = float(os.environ.get('SMP_REPLAY_ERROR_RATE', 0))
+REPLAY_SEED = os.environ.get('SMP_REPLAY_SEED')
+REPLAY_CACHE_BYTES = int(os.environ.get('SMP_REPLAY_CACHE_MB', 512)) * 1024 * 1024
+
+# Fixture layout under the replay directory:
+#   history/<interval>/<ticker>.csv   Date index (UTC for intraday), yfinance columns
+#   info/<ticker>.json                Ticker.info
+#   calendar/<ticker>.json            Ticker.calendar, dates as ISO strings
+
+
+class InjectedError(ConnectionError):
+    pass
+
+
+class ReplayProvider(MarketDataProvider):
+    # Serves recorded responses from disk. With align_dates the recordings
+    # are moved forward by whole weeks so the last bar falls in the current
+    # week, and period slicing works however old the recording is.
+    host = 'replay'
+
+    def __init__(self, directory=REPLAY_DIR, latency=REPLAY_LATENCY, jitter=REPLAY_JITTER,
+                 error_rate=REPLAY_ERROR_RATE, seed=REPLAY_SEED, align_dates=True):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.align_dates = align_dates
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._histories = SizedLRUCache(REPLAY_CACHE_BYTES, float('inf'))
+
+    def _request(self, what):
+        # One simulated round trip
+        with self._random_lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise InjectedError(f"injected error for {what}")
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _history(self, ticker, interval):
+        def load():
+            path = self._path('history', interval, f'{ticker}.csv')
+            if not os.path.exists(path):
+                return pd.DataFrame()
+            data = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+            if self.align_dates and not data.empty:
+                weeks = (pd.Timestamp.today().normalize() - data.index.max().normalize()).days // 7
+                data.index = data.index + pd.Timedelta(weeks=weeks)
+            return data
+        return self._histories.get_or_load((ticker, interval), load)
+
+    def _slice(self, data, period, start):
+        start = start if start is not None else period_start(period)
+        if start is None or data.empty:
+            return data.copy()
+        start = pd.Timestamp(start)
+        if start.tz is not None:
+            # Intraday starts come in UTC, which the recordings are in
+            start = start.tz_convert('UTC').tz_localize(None)
+        return data.loc[data.index >= start].copy()
+
+    def fetch_stock_data(self, ticker, period, interval, start=None):
+        self._request(ticker)
+        return self._slice(self._history(ticker, interval), period, start)
+
+    def download_chunk(self, tickers, period, interval, start=None):
+        self._request(f"{len(tickers)} tickers")
+        return {ticker: self._slice(self._history(ticker, interval), period, start) for ticker in tickers}
+
+    def get_stock_info(self, ticker):
+        self._request(ticker)
+        return _read_json(self._path('info', f'{ticker}.json'))
+
+    def get_stock_calendar(self, ticker):
+        self._request(ticker)
+        calendar = _read_json(self._path('calendar', f'{ticker}.json'))
+        return {key: _parse_dates(value) if 'Date' in key else value for key, value in calendar.items()}
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(value, f, default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, (dt.date, pd.Timestamp)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _parse_dates(value):
+    if isinstance(value, list):
+        return [_parse_dates(item) for item in value]
+    if isinstance(value, str):
+        try:
+            return dt.date.fromisoformat(value[:10])
+        except ValueError:
+            return value
+    return value
+
+
+def record(tickers, directory=REPLAY_DIR, provider=None, intervals=(('1d', 'max'), ('1h', '730d')),
+           with_info=True):
+    # Saves live responses for tickers as replay fixtures. Returns
+    # {ticker: error} for what could not be recorded.
+    provider = provider or get_provider()
+    tickers = list(tickers)
+    errors = {}
+    for interval, period in intervals:
+        histories = provider.download_history(tickers, period, interval, errors=errors)
+        for ticker, data in histories.items():
+            data.index = stored_index(data.index, interval)
+            path = os.path.join(directory, 'history', interval, f'{ticker}.csv')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data.to_csv(path, index_label='Date')
+    if with_info:
+        for ticker in tickers:
+            try:
+                _write_json(os.path.join(directory, 'info', f'{ticker}.json'), provider.get_stock_info(ticker))
+                _write_json(os.path.join(directory, 'calendar', f'{ticker}.json'),
+                            provider.get_stock_calendar(ticker) or {})
+            except Exception as e:
+                errors[ticker] = e
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record live responses as replay fixtures')
+    parser.add_argument('tickers', nargs='*', help='tickers to record (default: the screened universe)')
+    parser.add_argument('--directory', default=REPLAY_DIR)
+    parser.add_argument('--no-info', action='store_true', help='only record history')
+    args = parser.parse_args()
+    if args.tickers:
+        tickers = args.tickers
+    else:
+        from utils.universe import universe_tickers
+        tickers = universe_tickers()
+    failed = record(tickers, args.directory, with_info=not args.no_info)
+    print(f"Recorded {len(tickers) - len(failed)}/{len(tickers)} tickers to {args.directory}")
@@ -0,0 +1,62 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SingleFlightCache:
+    # Process-wide cache of computed results. Concurrent callers for the same
+    # key share a single in-progress computation instead of starting their own.
+    def __init__(self, ttl, min_refresh_interval=0):
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute, force=False):
+        # force skips the TTL, but never recomputes more often than
+        # min_refresh_interval
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry[1]
+                fresh = age < self.ttl and not force
+                if fresh or (force and age < self.min_refresh_interval):
+                    return entry[0]
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = Future()
+                self._inflight[key] = flight
+        if not owner:
+            return flight.result()
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if entry is not None:
+                # Keep serving the last good result rather than failing every caller
+                print(f"Error refreshing {key!r}, serving cached result:", e)
+                flight.set_result(entry[0])
+                return entry[0]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._inflight.pop(key, None)
+        flight.set_result(value)
+        return value
+
+    def peek(self, key):
+        # (value, computed_at) or None, without computing anything
+        with self._lock:
+            return self._entries.get(key)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import namedtuple
+import pandas as pd
+
+Snapshot = namedtuple('Snapshot', ['version', 'created_at', 'df'])
+# records holds the hits of the running scan so far; show_partial is set for
+# the first scan and for scans asked for with refresh(), whose rows are worth
+# streaming into the table before the scan completes
+ScanProgress = namedtuple('ScanProgress', ['scan_id', 'running', 'done', 'total', 'records', 'show_partial'])
+
+
+class ScreenScheduler:
+    # Runs the screen on a background thread every `interval` seconds and
+    # publishes each new result as a versioned snapshot. Readers only ever
+    # take the latest snapshot, so they never wait on a scan.
+    # compute(on_progress, cancel_event) returns the screen DataFrame.
+    def __init__(self, compute, interval, name='screen-scheduler'):
+        self.compute = compute
+        self.interval = interval
+        self.name = name
+        self._snapshot = Snapshot(0, None, pd.DataFrame())
+        self._progress = ScanProgress(0, False, 0, 0, [], False)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._cancel = threading.Event()
+        self._requested = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._cancel.set()
+        self._wake.set()
+
+    def refresh(self):
+        # Ask for a scan now instead of waiting for the next tick
+        self._requested = True
+        self._wake.set()
+
+    def cancel(self):
+        # Stops the running scan; the last complete snapshot stays published
+        if self._progress.running:
+            self._cancel.set()
+
+    def latest(self):
+        return self._snapshot
+
+    def progress(self):
+        return self._progress
+
+    def _on_progress(self, done, total, records):
+        self._progress = self._progress._replace(done=done, total=total, records=records)
+
+    def publish(self, df):
+        with self._lock:
+            if df is self._snapshot.df:
+                return self._snapshot
+            self._snapshot = Snapshot(self._snapshot.version + 1, time.time(), df)
+            return self._snapshot
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._cancel.clear()
+            show_partial = self._requested or self._snapshot.version == 0
+            self._requested = False
+            self._progress = ScanProgress(self._progress.scan_id + 1, True, 0, 0, [], show_partial)
+            try:
+                self.publish(self.compute(self._on_progress, self._cancel))
+            except Exception as e:
+                print(f"Error in {self.name}:", e)
+            finally:
+                self._progress = self._progress._replace(running=False)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+class PeriodicRefresher:
+    # Calls refresh() on a background thread every `interval` seconds, for
+    # upkeep jobs that fill a store rather than publish a result. The last
+    # result (e.g. how many tickers were refreshed) and its time are kept
+    # for inspection only.
+    def __init__(self, refresh, interval, name='refresher'):
+        self.refresh = refresh
+        self.interval = interval
+        self.name = name
+        self.last_result = None
+        self.last_run = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.last_result = self.refresh()
+                self.last_run = time.time()
+            except Exception as e:
+                print(f"Error in {self.name}:", e)
+            self._stopped.wait(self.interval)
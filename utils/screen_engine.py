@@ -0,0 +1,46 @@
+import numpy as np
+from utils.signal_rules import load_rules
+
+# Compiled once at import; set SMP_SCREEN_RULES to a JSON rules file to change it
+SCREEN_RULES = load_rules()
+
+
+def build_panel(histories, tickers, column='close', length=None):
+    # Bars x tickers array of one column, right-aligned so the last row is each
+    # ticker's latest bar. Tickers trade on different exchange calendars, so
+    # aligning by bar keeps every indicator window on the ticker's own sessions.
+    values_by_ticker = []
+    for ticker in tickers:
+        data = histories.get(ticker)
+        if data is None or data.empty:
+            values_by_ticker.append(np.empty(0))
+        else:
+            values_by_ticker.append(data[column].to_numpy(dtype=float))
+    if length is None:
+        length = max((len(values) for values in values_by_ticker), default=0)
+    panel = np.full((length, len(tickers)), np.nan)
+    for position, values in enumerate(values_by_ticker):
+        values = values[-length:] if length else values[:0]
+        if len(values):
+            panel[length - len(values):, position] = values
+    return panel
+
+
+def build_close_panel(histories, tickers, length=None):
+    return build_panel(histories, tickers, 'close', length)
+
+
+def screen_universe(histories, tickers, rules=None):
+    # Returns [(ticker, rule name)] for every rule that fired on a ticker's
+    # latest bar, in ticker then rule order
+    rules = rules or SCREEN_RULES
+    tickers = list(tickers)
+    if not tickers or not rules.rules:
+        return []
+    # Only the windows ending on the last two bars are needed
+    length = max(rules.lookback, 2) if rules.lookback is not None else None
+    panels = {column: build_panel(histories, tickers, column, length) for column in rules.columns}
+    if next(iter(panels.values())).shape[0] < 2:
+        return []
+    masks = rules.masks(rules.compute_series(panels))
+    return [(tickers[i], rules.names[r]) for i, r in zip(*np.nonzero(masks.T))]
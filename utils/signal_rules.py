@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import numpy as np
+
+# A rule fires when series `a` crosses `b` on the latest bar. Series are price
+# columns ('close', 'open', 'high', 'low', 'volume') or an indicator of the
+# close written as '<INDICATOR>_<window>', e.g. 'SMA_50' or 'EMA_21'.
+DEFAULT_RULES = [
+    {'name': '30 cross 50 above', 'a': 'SMA_30', 'b': 'SMA_50', 'cross': 'above'},
+    {'name': '30 cross 50 below', 'a': 'SMA_30', 'b': 'SMA_50', 'cross': 'below'},
+    {'name': '30 cross 200 below', 'a': 'SMA_30', 'b': 'SMA_200', 'cross': 'below'},
+    {'name': '30 cross 200 above', 'a': 'SMA_30', 'b': 'SMA_200', 'cross': 'above'},
+    {'name': 'Last below 200', 'a': 'close', 'b': 'SMA_200', 'cross': 'below'},
+    {'name': 'Last above 200', 'a': 'close', 'b': 'SMA_200', 'cross': 'above'},
+]
+
+# JSON file with a list of rules in the format above, to change the screen
+# without editing code
+RULES_PATH = os.environ.get('SMP_SCREEN_RULES')
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+INDICATORS = ('SMA', 'EMA')
+
+
+def parse_series(spec):
+    # 'close' -> ('close', None, None); 'SMA_50' -> ('close', 'SMA', 50)
+    if spec in PRICE_COLUMNS:
+        return spec, None, None
+    match = re.fullmatch(r'([A-Z]+)_(\d+)', spec)
+    if match is None or match.group(1) not in INDICATORS or int(match.group(2)) < 1:
+        raise ValueError(f"Unknown series {spec!r}")
+    return 'close', match.group(1), int(match.group(2))
+
+
+def rolling_mean(panel, window):
+    # Simple moving average down each column; NaN until a full window of
+    # valid values is available, like talib.SMA
+    valid = ~np.isnan(panel)
+    sums = np.cumsum(np.where(valid, panel, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    zeros = np.zeros((1, panel.shape[1]))
+    sums = np.vstack([zeros, sums])
+    counts = np.vstack([zeros, counts])
+    result = np.full(panel.shape, np.nan)
+    if panel.shape[0] < window:
+        return result
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    result[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+def exponential_mean(panel, window):
+    # talib.EMA semantics: seeded with the SMA of the first window, then
+    # recursive. Loops over bars but is vectorized across tickers.
+    seeds = rolling_mean(panel, window)
+    k = 2.0 / (window + 1)
+    result = np.full(panel.shape, np.nan)
+    previous = np.full(panel.shape[1], np.nan)
+    for row in range(panel.shape[0]):
+        current = np.where(np.isnan(previous), seeds[row], previous + k * (panel[row] - previous))
+        result[row] = current
+        previous = current
+    return result
+
+
+def compute_indicator(panel, indicator, window):
+    if indicator is None:
+        return panel
+    if indicator == 'SMA':
+        return rolling_mean(panel, window)
+    return exponential_mean(panel, window)
+
+
+class RuleSet:
+    # Rules compiled once: every series is computed a single time however many
+    # rules use it, and all rules are evaluated as boolean masks over tickers
+    def __init__(self, rules=None):
+        rules = DEFAULT_RULES if rules is None else rules
+        self.rules = []
+        self.series = {}
+        for rule in rules:
+            if rule.get('cross') not in ('above', 'below'):
+                raise ValueError(f"Rule {rule.get('name')!r} needs cross 'above' or 'below'")
+            for spec in (rule['a'], rule['b']):
+                self.series[spec] = parse_series(spec)
+            self.rules.append((rule['name'], rule['a'], rule['b'], rule['cross']))
+        self.names = [name for name, _, _, _ in self.rules]
+        windows = [window for _, indicator, window in self.series.values() if indicator == 'SMA']
+        self.columns = sorted({column for column, _, _ in self.series.values()})
+        # Bars needed to evaluate the last two bars exactly; EMAs depend on
+        # the whole history, so they need all of it
+        if any(indicator == 'EMA' for _, indicator, _ in self.series.values()):
+            self.lookback = None
+        else:
+            self.lookback = max(windows, default=1) + 1
+
+    def compute_series(self, panels):
+        # panels: {column: bars x tickers array}
+        return {spec: compute_indicator(panels[column], indicator, window)
+                for spec, (column, indicator, window) in self.series.items()}
+
+    def masks(self, series):
+        # One boolean row per rule, True where the cross happened on the last bar
+        masks = []
+        for _, a, b, cross in self.rules:
+            today_a, yesterday_a = series[a][-1], series[a][-2]
+            today_b, yesterday_b = series[b][-1], series[b][-2]
+            if cross == 'above':
+                masks.append((today_a > today_b) & (yesterday_a < yesterday_b))
+            else:
+                masks.append((today_a < today_b) & (yesterday_a > yesterday_b))
+        return np.vstack(masks) if masks else np.zeros((0, 0), dtype=bool)
+
+    def history_masks(self, series):
+        # {rule name: bars x tickers mask}, True on every bar where the cross
+        # happened, for backtesting
+        masks = {}
+        for name, a, b, cross in self.rules:
+            today_a, yesterday_a = series[a][1:], series[a][:-1]
+            today_b, yesterday_b = series[b][1:], series[b][:-1]
+            if cross == 'above':
+                fired = (today_a > today_b) & (yesterday_a < yesterday_b)
+            else:
+                fired = (today_a < today_b) & (yesterday_a > yesterday_b)
+            masks[name] = np.vstack([np.zeros((1, fired.shape[1]), dtype=bool), fired])
+        return masks
+
+    def evaluate_frame(self, stock_data):
+        # Names of every rule that fired on the frame's last bar
+        if stock_data is None or len(stock_data) < 2:
+            return []
+        panels = {column: stock_data[column].to_numpy(dtype=float).reshape(-1, 1)
+                  for column in self.columns}
+        masks = self.masks(self.compute_series(panels))
+        return [name for name, fired in zip(self.names, masks[:, 0]) if fired]
+
+
+def load_rules(path=RULES_PATH):
+    if not path:
+        return RuleSet()
+    with open(path) as f:
+        return RuleSet(json.load(f))
@@ -0,0 +1,212 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+from utils.screen_engine import SCREEN_RULES
+
+
+class RollingSMA:
+    # Running sum over the last `window` values; push/revise are O(1)
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self._pushes = 0
+
+    def seed(self, values):
+        self.values = deque((float(value) for value in values[-self.window:]), maxlen=self.window)
+        self.total = math.fsum(self.values)
+        self._pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._pushes += 1
+        # Re-sum once per window so float drift never accumulates
+        if self._pushes >= self.window:
+            self.total = math.fsum(self.values)
+            self._pushes = 0
+
+    def revise(self, value):
+        self.total += value - self.values[-1]
+        self.values[-1] = value
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return math.nan
+        return self.total / self.window
+
+
+class RollingEMA:
+    # talib.EMA semantics: an SMA over the first window, then recursive.
+    # Keeps the EMA of the previous bar so the last bar can be revised.
+    def __init__(self, window):
+        self.window = window
+        self.k = 2.0 / (window + 1)
+        self._warmup = RollingSMA(window)
+        self._base = math.nan
+        self.value = math.nan
+
+    def seed(self, values):
+        self.__init__(self.window)
+        for value in values:
+            self.push(float(value))
+
+    def push(self, value):
+        self._base = self.value
+        if math.isnan(self._base):
+            self._warmup.push(value)
+            self.value = self._warmup.value
+        else:
+            self.value = self._base + self.k * (value - self._base)
+
+    def revise(self, value):
+        if math.isnan(self._base):
+            self._warmup.revise(value)
+            self.value = self._warmup.value
+        else:
+            self.value = self._base + self.k * (value - self._base)
+
+
+class TickerScreenState:
+    # Indicator state for one ticker, covering every series the rules use
+    def __init__(self, rules=SCREEN_RULES):
+        self.rules = rules
+        self.indicators = {}
+        for spec, (column, indicator, window) in rules.series.items():
+            if indicator == 'SMA':
+                self.indicators[spec] = RollingSMA(window)
+            elif indicator == 'EMA':
+                self.indicators[spec] = RollingEMA(window)
+        self.last_date = None
+        self.previous_date = None
+        self.previous = None
+        self.current = None
+        # The bars the indicators were built from, newest last, so callers
+        # can check they are still the bars in the history
+        self.dates = deque(maxlen=rules.lookback)
+        self.closes = deque(maxlen=rules.lookback)
+
+    def seed(self, dates, closes):
+        # Rebuild from history: the state just before the last bar, then the last bar
+        closes = np.asarray(closes, dtype=float)
+        for indicator in self.indicators.values():
+            indicator.seed(closes[:-1])
+        self.dates = deque(dates[:-1], maxlen=self.rules.lookback)
+        self.closes = deque((float(close) for close in closes[:-1]), maxlen=self.rules.lookback)
+        self.last_date = dates[-2] if len(dates) > 1 else None
+        self.previous_date = None
+        self.current = self._snapshot(closes[-2]) if len(closes) > 1 else None
+        self.update(dates[-1], closes[-1])
+
+    def update(self, date, close):
+        close = float(close)
+        if self.last_date is not None and date == self.last_date:
+            for indicator in self.indicators.values():
+                indicator.revise(close)
+            self.closes[-1] = close
+        elif self.last_date is not None and date < self.last_date:
+            raise ValueError(f"Bar {date} is older than the last bar {self.last_date}")
+        else:
+            for indicator in self.indicators.values():
+                indicator.push(close)
+            self.dates.append(date)
+            self.closes.append(close)
+            self.previous_date, self.previous = self.last_date, self.current
+            self.last_date = date
+        self.current = self._snapshot(close)
+
+    def _snapshot(self, close):
+        snapshot = {'close': close}
+        for spec, indicator in self.indicators.items():
+            snapshot[spec] = indicator.value
+        return snapshot
+
+    def signals(self):
+        # Every rule that fired on the last bar
+        if self.previous is None or self.current is None:
+            return []
+        today, yesterday = self.current, self.previous
+        fired = []
+        for name, a, b, cross in self.rules.rules:
+            if cross == 'above':
+                if today[a] > today[b] and yesterday[a] < yesterday[b]:
+                    fired.append(name)
+            elif today[a] < today[b] and yesterday[a] > yesterday[b]:
+                fired.append(name)
+        return fired
+
+
+def supports_incremental(rules):
+    # The state only tracks the close, so rules on the other price columns
+    # have to be screened from the full history
+    return rules.columns in ([], ['close'])
+
+
+class IncrementalScreener:
+    # Keeps a TickerScreenState per ticker between scans, so a refresh only
+    # applies the bars at or after the last one seen. Rules may only use the
+    # close and indicators of it, see supports_incremental.
+    def __init__(self, rules=SCREEN_RULES):
+        if not supports_incremental(rules):
+            raise ValueError("Incremental screening only supports rules on the close")
+        self.rules = rules
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def _seed(self, ticker, stock_data):
+        state = TickerScreenState(self.rules)
+        tail = stock_data if self.rules.lookback is None else stock_data.iloc[-self.rules.lookback:]
+        state.seed(list(tail.index), tail['close'].to_numpy(dtype=float))
+        self.states[ticker] = state
+        return state
+
+    def _sync_position(self, state, dates, closes):
+        # Position of the last seen bar, or None when any bar the state was
+        # built from was added, dropped or changed and it has to be rebuilt.
+        # Stored bars change behind the last one when history is re-adjusted
+        # and when a top-up reclassifies recent bars as outliers. The last
+        # bar itself may be revised, as a partial session is.
+        position = dates.searchsorted(state.last_date)
+        if position >= len(dates) or dates[position] != state.last_date:
+            return None
+        start = position + 1 - len(state.dates)
+        if start < 0 or list(dates[start:position + 1]) != list(state.dates):
+            return None
+        if not np.array_equal(closes[start:position], list(state.closes)[:-1]):
+            return None
+        return position
+
+    def update(self, ticker, stock_data):
+        if stock_data is None or stock_data.empty:
+            self.states.pop(ticker, None)
+            return []
+        dates = stock_data.index
+        closes = stock_data['close'].to_numpy(dtype=float)
+        with self._lock:
+            state = self.states.get(ticker)
+            position = None if state is None else self._sync_position(state, dates, closes)
+            if position is None:
+                state = self._seed(ticker, stock_data)
+            else:
+                for i in range(position, len(closes)):
+                    state.update(dates[i], closes[i])
+            return state.signals()
+
+    def push_bar(self, ticker, date, close):
+        # Bar-by-bar feed: a bar with the same date as the last one revises it
+        with self._lock:
+            state = self.states.setdefault(ticker, TickerScreenState(self.rules))
+            state.update(date, close)
+            return state.signals()
+
+    def screen(self, histories, tickers):
+        # Same output as screen_engine.screen_universe
+        hits = []
+        for ticker in tickers:
+            for signal in self.update(ticker, histories.get(ticker)):
+                hits.append((ticker, signal))
+        return hits
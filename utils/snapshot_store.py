@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from utils.async_fetch import AsyncFetcher, report_errors
+from utils.universe import INDEX_LABELS, universe_tickers
+
+SNAPSHOT_COLUMNS = ['ticker', 'data', 'updated_at']
+
+
+class SnapshotStore:
+    # One JSON value per ticker with the time it was fetched, on disk and
+    # mirrored in memory so lookups never touch the database. Subclasses name
+    # the table and convert their values with encode() and decode().
+    table = None
+    max_age = 24 * 60 * 60
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({self.table})')]
+            if columns and columns != SNAPSHOT_COLUMNS:
+                # Written in an earlier layout; the next refresh fills it again
+                conn.execute(f'DROP TABLE {self.table}')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                f'ticker TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            rows = conn.execute(f'SELECT ticker, data, updated_at FROM {self.table}').fetchall()
+        self._entries = {ticker: (self.decode(json.loads(data)), updated_at) for ticker, data, updated_at in rows}
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def encode(self, value):
+        # value -> something json.dumps takes
+        return value
+
+    def decode(self, data):
+        return data
+
+    def entry(self, ticker):
+        # (value, fetched at), or None if the ticker was never fetched. The
+        # value is shared; copy it before changing it.
+        return self._entries.get(ticker)
+
+    def get(self, ticker):
+        entry = self._entries.get(ticker)
+        return None if entry is None else entry[0]
+
+    def stale(self, tickers, max_age=None):
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+        entries = self._entries
+        return [ticker for ticker in tickers if ticker not in entries or now - entries[ticker][1] > max_age]
+
+    def write_many(self, values):
+        # values: {ticker: value}
+        now = time.time()
+        encoded = {ticker: self.encode(value) for ticker, value in values.items()}
+        if not encoded:
+            return
+        rows = [(ticker, json.dumps(data), now) for ticker, data in encoded.items()]
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (ticker, data, updated_at) VALUES (?, ?, ?)', rows)
+            entries = dict(self._entries)
+            for ticker, data in encoded.items():
+                entries[ticker] = (self.decode(data), now)
+            # Swapped in whole so readers never need the lock
+            self._entries = entries
+
+
+def refresh_snapshots(store, fetch, host, tickers=None, force=False, concurrency=4, errors=None,
+                      what='snapshots'):
+    # Fetches every ticker with no entry or one older than the store's
+    # max_age (every ticker with force), default the whole listed universe.
+    # Returns how many were refreshed.
+    tickers = list(universe_tickers(tuple(INDEX_LABELS)) if tickers is None else tickers)
+    due = tickers if force else store.stale(tickers)
+    if not due:
+        return 0
+    values, failed = AsyncFetcher(concurrency=concurrency, host=host).run(due, fetch)
+    store.write_many(values)
+    if errors is not None:
+        errors.update(failed)
+    else:
+        report_errors(failed, what)
+    return len(values)
@@ -0,0 +1,82 @@
+import bisect
+import re
+import threading
+from collections import Counter, defaultdict
+
+SEARCH_LIMIT = 10
+# Prefix matches looked at per query; one-letter queries would otherwise walk
+# a large part of the index
+PREFIX_CANDIDATES = 200
+
+
+def _trigrams(text):
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TickerSearchIndex:
+    # Symbol and company-name lookup for the ticker input. Ranking: exact
+    # symbol, symbol prefix, name-word prefix, then trigram similarity for
+    # typos and infix matches.
+    def __init__(self, entries=()):
+        self.symbols = []
+        self.names = []
+        self._ids = {}
+        self._symbol_keys = []
+        self._word_keys = []
+        self._trigrams = defaultdict(set)
+        self._lock = threading.Lock()
+        for symbol, name in entries:
+            self.add(symbol, name)
+
+    def add(self, symbol, name=''):
+        name = name or ''
+        with self._lock:
+            entry_id = self._ids.get(symbol)
+            if entry_id is None:
+                entry_id = len(self.symbols)
+                self._ids[symbol] = entry_id
+                self.symbols.append(symbol)
+                self.names.append('')
+                bisect.insort(self._symbol_keys, (symbol.lower(), entry_id))
+                self._index_trigrams(entry_id, symbol.lower())
+            if name and not self.names[entry_id]:
+                self.names[entry_id] = name
+                for word in set(re.findall(r'\w+', name.lower())):
+                    bisect.insort(self._word_keys, (word, entry_id))
+                self._index_trigrams(entry_id, name.lower())
+
+    def _index_trigrams(self, entry_id, text):
+        for gram in _trigrams(text):
+            self._trigrams[gram].add(entry_id)
+
+    def _prefix_ids(self, keys, prefix):
+        start = bisect.bisect_left(keys, (prefix,))
+        for key, entry_id in keys[start:start + PREFIX_CANDIDATES]:
+            if not key.startswith(prefix):
+                break
+            yield key, entry_id
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # [(symbol, name)] best first
+        query = (query or '').strip().lower()
+        if not query:
+            return []
+        scores = {}
+        with self._lock:
+            for key, entry_id in self._prefix_ids(self._symbol_keys, query):
+                score = 3.0 if key == query else 2.0
+                scores[entry_id] = max(scores.get(entry_id, 0), score)
+            for _, entry_id in self._prefix_ids(self._word_keys, query):
+                scores[entry_id] = max(scores.get(entry_id, 0), 1.5)
+            if len(query) >= 3:
+                grams = _trigrams(query)
+                matches = Counter()
+                for gram in grams:
+                    matches.update(self._trigrams.get(gram, ()))
+                for entry_id, count in matches.items():
+                    similarity = count / len(grams)
+                    if similarity >= 0.5:
+                        scores[entry_id] = max(scores.get(entry_id, 0), similarity)
+            ranked = sorted(scores, key=lambda i: (-scores[i], len(self.symbols[i]), self.symbols[i]))
+            return [(self.symbols[i], self.names[i]) for i in ranked[:limit]]
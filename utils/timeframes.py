@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.market_data import period_start
+
+# Each screen timeframe is derived from a stored base interval; higher ones
+# are resampled rather than downloaded. period is how much history the
+# screen needs on that timeframe (200 weekly bars is about four years).
+TIMEFRAMES = {
+    '1h': {'interval': '1h', 'period': '3mo', 'resample': None},
+    '1d': {'interval': '1d', 'period': '1y', 'resample': None},
+    '1wk': {'interval': '1d', 'period': '5y', 'resample': 'W-FRI'},
+}
+
+SCREEN_TIMEFRAMES = [timeframe.strip() for timeframe in
+                     os.environ.get('SMP_SCREEN_TIMEFRAMES', '1h,1d,1wk').split(',') if timeframe.strip()]
+
+OHLCV_AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def resample_bars(data, rule):
+    # The current, unfinished period gets a partial bar, which later
+    # refreshes revise like any other last bar
+    if data.empty:
+        return data
+    bars = data.resample(rule).agg(OHLCV_AGGREGATION)
+    return bars.dropna(subset=['close'])
+
+
+def resample_many(histories, rule):
+    # resample_bars for a whole chunk of {ticker: bars} in one pass: every
+    # bar gets its period's label, and each run of bars with the same ticker
+    # and label is reduced into one bar. Only period rules like 'W-FRI'.
+    # Frames with missing prices are left to resample_bars, which skips them.
+    resampled = {}
+    tickers, lengths, dates, blocks = [], [], [], []
+    for ticker, data in histories.items():
+        if data is None or data.empty:
+            resampled[ticker] = data
+            continue
+        block = data[list(OHLCV_AGGREGATION)].to_numpy(dtype=float)
+        if np.isnan(block).any():
+            resampled[ticker] = resample_bars(data, rule)
+            continue
+        tickers.append(ticker)
+        lengths.append(len(block))
+        dates.append(data.index.values)
+        blocks.append(block)
+    if not tickers:
+        return resampled
+    values = np.concatenate(blocks)
+    labels = pd.DatetimeIndex(np.concatenate(dates)).to_period(rule).end_time.normalize()
+    owners = np.repeat(np.arange(len(tickers)), lengths)
+    label_values = labels.asi8
+    # Each ticker's bars are in date order, so its bins are contiguous runs
+    starts = np.concatenate(([0], np.flatnonzero((owners[1:] != owners[:-1]) |
+                                                 (label_values[1:] != label_values[:-1])) + 1))
+    ends = np.concatenate((starts[1:], [len(values)]))
+    bars = pd.DataFrame({
+        'open': values[starts, 0],
+        'high': np.maximum.reduceat(values[:, 1], starts),
+        'low': np.minimum.reduceat(values[:, 2], starts),
+        'close': values[ends - 1, 3],
+        'volume': np.add.reduceat(values[:, 4], starts),
+    }, index=pd.DatetimeIndex(labels[starts], name=histories[tickers[0]].index.name))
+    bounds = np.searchsorted(owners[starts], np.arange(len(tickers) + 1))
+    for i, ticker in enumerate(tickers):
+        resampled[ticker] = bars.iloc[bounds[i]:bounds[i + 1]]
+    return resampled
+
+
+def base_groups(timeframes):
+    # {base interval: (longest period needed, [timeframes])}, so each base is loaded once
+    groups = {}
+    for timeframe in timeframes:
+        config = TIMEFRAMES[timeframe]
+        period, members = groups.get(config['interval'], (config['period'], []))
+        if _period_length(config['period']) > _period_length(period):
+            period = config['period']
+        groups[config['interval']] = (period, members + [timeframe])
+    return groups
+
+
+def _period_length(period):
+    start = period_start(period)
+    return pd.Timedelta.max if start is None else pd.Timestamp.today().normalize() - start
+
+
+def to_timeframe(data, timeframe):
+    # Base interval history (possibly longer than needed) -> bars for timeframe
+    config = TIMEFRAMES[timeframe]
+    if data is None or data.empty:
+        return data
+    start = period_start(config['period'])
+    if start is not None:
+        data = data.loc[data.index >= start]
+    if config['resample'] is not None:
+        data = resample_bars(data, config['resample'])
+    return data
+
+
+def to_timeframes(histories, timeframe):
+    # to_timeframe over a chunk of {ticker: base interval history}
+    config = TIMEFRAMES[timeframe]
+    start = period_start(config['period'])
+    if start is not None:
+        histories = {ticker: data if data is None or data.empty else data.loc[data.index >= start]
+                     for ticker, data in histories.items()}
+    if config['resample'] is not None:
+        histories = resample_many(histories, config['resample'])
+    return histories
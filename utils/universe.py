@@ -0,0 +1,183 @@
+import argparse
+import csv
+import functools
+import os
+import re
+from html.parser import HTMLParser
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNIVERSE_PATH = os.environ.get('SMP_UNIVERSE_PATH', os.path.join(BASE_DIR, 'universe.csv'))
+
+INDEX_LABELS = {
+    'smp500': 'S&P 500',
+    'russell500': 'Russell 500',
+    'euro_stoxx_200': 'Euro Stoxx 200',
+    'nifty50': 'Nifty 50',
+}
+# What a scan covers unless told otherwise
+DEFAULT_INDICES = ('smp500', 'russell500', 'euro_stoxx_200')
+
+# Constituent tables saved from Wikipedia. Symbols there are exchange-local
+# ('BRK.B', 'RELIANCE'); suffix turns them into the provider's form.
+INDEX_PAGES = [
+    {'index': 'smp500', 'page': 'smp500.html', 'symbol': 'Symbol', 'name': 'Security',
+     'sector': 'GICS Sector', 'suffix': ''},
+    {'index': 'nifty50', 'page': 'nifty50.html', 'symbol': 'Symbol', 'name': 'Company name',
+     'sector': 'Sector', 'suffix': '.NS'},
+]
+# Indices without a bundled page yet; their lists in smp_tickers.py are
+# already in provider form but have no names or sectors
+INDEX_LISTS = [
+    {'index': 'russell500', 'list': 'russell500_tickers'},
+    {'index': 'euro_stoxx_200', 'list': 'euro_stoxx_200_tickers'},
+]
+INDEX_ORDER = ['smp500', 'russell500', 'euro_stoxx_200', 'nifty50']
+
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9&]+(?:-[A-Z0-9]+)*(?:\.[A-Z]{1,3})?')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ConstituentsTableParser(HTMLParser):
+    # Collects the cell text of one table, by id, as a list of rows. Footnote
+    # markers are skipped; nested tables are ignored.
+    def __init__(self, table_id='constituents'):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.rows = []
+        self.done = False
+        self._depth = 0
+        self._row = None
+        self._cell = None
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            if self._depth:
+                self._depth += 1
+            elif not self.done and dict(attrs).get('id') == self.table_id:
+                self._depth = 1
+        elif self._depth != 1:
+            return
+        elif tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+        elif tag == 'sup':
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'table' and self._depth:
+            self._depth -= 1
+            self.done = self._depth == 0
+        elif self._depth != 1:
+            return
+        elif tag in ('td', 'th') and self._cell is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+        elif tag == 'sup' and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if self._cell is not None and not self._skip:
+            self._cell.append(data)
+
+
+def parse_constituents(path, table_id='constituents'):
+    # [{header: cell}] for each row of the table, reading the page in chunks
+    # and stopping once the table has ended
+    parser = ConstituentsTableParser(table_id)
+    with open(path, encoding='utf-8') as f:
+        while not parser.done:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    if not parser.rows:
+        return []
+    header, *rows = parser.rows
+    return [dict(zip(header, row)) for row in rows if len(row) == len(header)]
+
+
+def normalize_symbol(symbol, suffix=''):
+    # Exchange-local symbol -> provider form, or None if it doesn't look like
+    # one: 'BRK.B' -> 'BRK-B', ('M&M', '.NS') -> 'M&M.NS'
+    symbol = symbol.strip().upper().replace('.', '-')
+    if suffix and not symbol.endswith(suffix):
+        symbol += suffix
+    return symbol if SYMBOL_PATTERN.fullmatch(symbol) else None
+
+
+def build_universe(base_dir=BASE_DIR, pages=INDEX_PAGES, lists=INDEX_LISTS):
+    # {symbol: {'name', 'sector', 'indices'}} in INDEX_ORDER, each symbol
+    # once; also returns the symbols that were rejected as malformed
+    # index -> [(raw symbol, provider symbol or None, name, sector)]
+    sources = {}
+    for page in pages:
+        rows = parse_constituents(os.path.join(base_dir, page['page']))
+        sources[page['index']] = [
+            (row[page['symbol']], normalize_symbol(row[page['symbol']], page['suffix']),
+             row.get(page['name'], ''), row.get(page['sector'], ''))
+            for row in rows
+        ]
+    if lists:
+        import smp_tickers
+        for source in lists:
+            sources[source['index']] = [
+                (symbol, symbol if SYMBOL_PATTERN.fullmatch(symbol) else None, '', '')
+                for symbol in getattr(smp_tickers, source['list'])
+            ]
+
+    listings = {}
+    rejected = []
+    for index in INDEX_ORDER + [index for index in sources if index not in INDEX_ORDER]:
+        for raw, symbol, name, sector in sources.get(index, []):
+            if symbol is None:
+                rejected.append(raw)
+                continue
+            listing = listings.setdefault(symbol, {'name': '', 'sector': '', 'indices': []})
+            listing['name'] = listing['name'] or name
+            listing['sector'] = listing['sector'] or sector
+            if index not in listing['indices']:
+                listing['indices'].append(index)
+    return listings, rejected
+
+
+def write_universe(listings, path=UNIVERSE_PATH):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['symbol', 'name', 'sector', 'indices'])
+        for symbol, listing in listings.items():
+            writer.writerow([symbol, listing['name'], listing['sector'], ' '.join(listing['indices'])])
+
+
+@functools.lru_cache(maxsize=None)
+def load_universe(path=UNIVERSE_PATH):
+    # {symbol: (name, sector, indices)}, read on first use rather than at import
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['symbol']: (row['name'], row['sector'], tuple(row['indices'].split()))
+                for row in csv.DictReader(f)}
+
+
+def universe_tickers(indices=DEFAULT_INDICES):
+    # Symbols in any of `indices` (or the one index named), in file order
+    indices = {indices} if isinstance(indices, str) else set(indices)
+    return [symbol for symbol, (_, _, member_of) in load_universe().items() if indices.intersection(member_of)]
+
+
+def universe_names():
+    return [(symbol, name) for symbol, (name, _, _) in load_universe().items()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild universe.csv from the bundled index pages')
+    parser.add_argument('--out', default=UNIVERSE_PATH)
+    args = parser.parse_args()
+    listings, rejected = build_universe()
+    write_universe(listings, args.out)
+    counts = {index: sum(index in listing['indices'] for listing in listings.values()) for index in INDEX_ORDER}
+    print(f"Wrote {len(listings)} symbols to {args.out}: {counts}")
+    if rejected:
+        print(f"Rejected malformed symbols: {rejected}")
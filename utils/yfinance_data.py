@@ -1,25 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
 import yfinance as yf
+from utils.async_fetch import FETCH_CONCURRENCY
+from utils.market_data import MarketDataProvider
+
+# Ticker objects keep .info and .calendar for as long as they live, so a
+# handle is only reused for this long
+TICKER_HANDLE_TTL = int(os.environ.get('SMP_TICKER_HANDLE_TTL', 15 * 60))
+TICKER_HANDLE_LIMIT = int(os.environ.get('SMP_TICKER_HANDLE_LIMIT', 5000))
+# Tickers per yf.download call. Each chunk runs on one of the fetcher's
+# long-lived threads rather than yfinance's own, so it reuses that thread's
+# open connection.
+YAHOO_CHUNK_SIZE = int(os.environ.get('SMP_YAHOO_CHUNK_SIZE', 20))
+
+
+def create_session(pool_size=FETCH_CONCURRENCY):
+    # Keep-alive session for every request the provider makes. curl_cffi,
+    # yfinance's default backend, keeps connections per thread; the requests
+    # fallback gets a pool with a connection for each fetcher thread.
+    try:
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    return curl_requests.Session(impersonate='chrome')
+
+
+class Yfinance(MarketDataProvider):
+    # One instance serves the whole process (see get_provider) and is safe to
+    # use from the fetcher's threads. Every request goes through one session,
+    # and Ticker objects are reused per symbol for TICKER_HANDLE_TTL.
+    history_chunk_size = YAHOO_CHUNK_SIZE
+
+    def __init__(self, tickers=(), session=None):
+        self._session = session
+        self._pid = None
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        for ticker in tickers:
+            self._ticker(ticker)
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child must not share the parent's connections
+                if self._session is None or self._pid is not None:
+                    self._session = create_session()
+                self._pid = os.getpid()
+                self._handles.clear()
+            return self._session
+
+    def _ticker(self, ticker):
+        session = self.session
+        now = time.time()
+        with self._lock:
+            handle = self._handles.pop(ticker, None)
+            if handle is None or handle[1] <= now:
+                handle = (yf.Ticker(ticker, session=session), now + TICKER_HANDLE_TTL)
+            self._handles[ticker] = handle
+            while len(self._handles) > TICKER_HANDLE_LIMIT:
+                self._handles.popitem(last=False)
+            return handle[0]
+
+    def fetch_stock_data(self, ticker, period, interval, start=None):
+        if start is not None:
+            return self._ticker(ticker).history(start=start, interval=interval, rounding=True)
+        return self._ticker(ticker).history(period=period, interval=interval, rounding=True)
+
+    def download_chunk(self, tickers, period, interval, start=None):
+        # One yf.download call per chunk instead of one Ticker.history call per
+        # symbol; the combined frame is split back into per-ticker frames.
+        kwargs = {'start': start} if start is not None else {'period': period}
+        data = yf.download(tickers, interval=interval, group_by='ticker', auto_adjust=True, actions=True,
+                           rounding=True, progress=False, threads=False, session=self.session, **kwargs)
+        histories = split_download(data, tickers)
+        if not any(not frame.empty for frame in histories.values()):
+            # Nothing at all usually means we were throttled; let the fetcher retry
+            raise ValueError(f"no data returned for {len(tickers)} tickers")
+        return histories
 
-class Yfinance:
-    def __init__(self, tickers):
-        self.tickers = tickers
-        self.data = yf.Tickers(tickers)
-    
-    def fetch_stock_data(self, ticker, period, interval):
-        if ticker in self.tickers:
-            return self.data.tickers[ticker].history(period=period, interval=interval, rounding=True)
-        return None
-    
     def get_stock_info(self, ticker):
-        return self.data.tickers[ticker].info
+        return self._ticker(ticker).info
 
     def get_stock_earning_dates(self, ticker):
-        return self.data.tickers[ticker].get_earnings_dates(limit=100)
+        return self._ticker(ticker).get_earnings_dates(limit=100)
     
     def get_stock_calendar(self, ticker):
-        return self.data.tickers[ticker].calendar
+        return self._ticker(ticker).calendar
     
 
+def split_download(data, tickers):
+    if data is None or data.empty:
+        return {ticker: pd.DataFrame() for ticker in tickers}
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {tickers[0]: data.dropna(how='all')}
+    available = set(data.columns.get_level_values(0))
+    histories = {}
+    for ticker in tickers:
+        if ticker not in available:
+            histories[ticker] = pd.DataFrame()
+            continue
+        frame = data[ticker].dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
+        frame.columns.name = None
+        histories[ticker] = frame
+    return histories
+
+
 if __name__ == '__main__':
     test = Yfinance(['IIND.L'])
     data = test.fetch_stock_data('IIND.L', 'max', '1d')